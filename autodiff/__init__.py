@@ -1,2 +1,34 @@
-from autodiff.array import Array, from_numpy
-from autodiff.operations import ln, exp, expand, sin, cos, tan, matmul, inv, transpose, mean_squared_error, reshape, conv2D, track_computation, sigmoid, softmax, mean, sum
\ No newline at end of file
+import importlib
+
+# public names are resolved on first access, so importing the package stays cheap
+_EXPORTS = {
+    "Array": "autodiff.array",
+    "SparseGradient": "autodiff.array",
+    "SliceGradient": "autodiff.array",
+    "from_numpy": "autodiff.array",
+}
+for _name in ["ln", "exp", "expand", "sin", "cos", "tan", "matmul", "multi_matmul", "einsum", "inv", "solve", "cholesky", "slogdet", "lstsq", "transpose",
+              "mean_squared_error", "softmax_cross_entropy", "reshape", "conv2D", "max_pool2D", "avg_pool2D",
+              "batch_norm", "layer_norm", "track_computation", "inference", "lazy", "custom_op", "Context",
+              "relu", "maximum", "where", "clip", "absolute", "sigmoid", "softmax", "mean", "sum", "gather", "scan",
+              "concatenate", "stack", "split"]:
+    _EXPORTS[_name] = "autodiff.operations"
+# exported under another name than in their module ("module:attribute"), e.g. to not shadow builtins there
+_EXPORTS["abs"] = "autodiff.operations:absolute"
+
+_SUBMODULES = {"array", "operations", "utils", "data", "parallel", "scheduler", "checkpoint", "statistics", "visualize", "memory", "codegen"}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name:str):
+    if name in _EXPORTS:
+        module, _, attr = _EXPORTS[name].partition(":")
+        value = getattr(importlib.import_module(module), attr or name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module("autodiff." + name)
+    raise AttributeError(f"module 'autodiff' has no attribute '{name}'")
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
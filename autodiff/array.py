@@ -11,6 +11,7 @@ class Array():
             if not np.issubdtype(arr.dtype, np.number):
                 raise ValueError("invalid dtype on value")
             self._value = arr
+        _memory.count_copy(self._value.nbytes)
         self._gradient:np.ndarray = None
 
         # array attributes
@@ -18,12 +19,18 @@ class Array():
         self.track_grads:bool = track_grads
 
         # computation graph elements
-        from autodiff.operations import Operation
-        self.operation:Operation = None
+        self.operation:"_ops.Operation" = None
         self.input:tuple = None
         self.params:tuple = None
 
+        # change tracking for incremental evaluation
+        self._version:int = 0
+        self._input_versions:tuple = None
+        self._backward_cache:tuple = None
+
     def get_value(self) -> np.ndarray:
+        if self._value is None:
+            _utils.materialize(self)
         return self._value
 
     def set_value(self, value):
@@ -33,6 +40,8 @@ class Array():
         if self.shape != v.shape:
             raise ValueError("value shape must match dimension of Expr")
         self._value = v.astype(self.dtype)
+        _memory.count_copy(self._value.nbytes)
+        self._version += 1
 
     value:np.ndarray = property(get_value, set_value)
 
@@ -40,60 +49,141 @@ class Array():
         return self._gradient
 
     def set_gradient(self, gradient):
-        g = np.array(gradient, ndmin=1)
+        if type(gradient) == SparseGradient or type(gradient) == SliceGradient:
+            gradient = gradient.to_dense()
+        # gradients are stored without copying (views of reshaped or transposed gradients stay views)
+        g = np.asarray(gradient)
+        if g.ndim == 0:
+            g = g.reshape(1)
         if not np.issubdtype(g.dtype, np.number):
             raise ValueError("value has to be numeric")
         if self.shape != g.shape:
             raise ValueError("gradient shape must match dimension of Expr")
-        self._gradient = g.astype(self.dtype)
+        if g.dtype != self.dtype:
+            g = g.astype(self.dtype)
+            _memory.count_copy(g.nbytes)
+        self._gradient = g
 
     gradient:np.ndarray = property(get_gradient, set_gradient)
 
     def get_shape(self) -> tuple:
+        if self._value is None:
+            return self._meta[0]
         return self._value.shape
 
     shape:tuple = property(get_shape)
 
     def get_dtype(self) -> tuple:
+        if self._value is None:
+            return self._meta[1]
         return self._value.dtype
 
     dtype = property(get_dtype)
 
+    def get_strides(self) -> tuple:
+        return self.value.strides
+
+    strides:tuple = property(get_strides)
+
+    def is_view(self) -> bool:
+        """
+        True if the value shares its memory with another array (e.g. the input of a reshape)
+        """
+        return self.value.base is not None
+
+    def is_contiguous(self) -> bool:
+        return self.value.flags.c_contiguous
+
+    contiguous:bool = property(is_contiguous)
+
     def __getitem__(self, key):
+        if self.track_grads:
+            if _is_index_array(key):
+                return _ops.Gather.apply(self, key)
+            if type(key) == np.ndarray and key.dtype == bool and key.ndim == 1:
+                return _ops.Gather.apply(self, np.flatnonzero(key))
+            if not _ops._is_basic_index(key):
+                raise ValueError("index not supported on Arrays tracking gradients")
+            return _ops.Slice.apply(self, key)
         arr = self.value[key]
         if type(arr) == np.ndarray:
             return Array(arr, dtype=self.dtype, track_grads=False)
         return self.value[key]
 
     def __setitem__(self, key, item):
+        """
+        assigns values in place
+
+        -> on nodes created by operations (and with tracked items) while tracking the computation,
+           the node is turned into a SetItem node on top of its previous state, so gradients flow
+           into the unchanged part and the assigned item \n
+        -> nodes which used the node before the assignment raise on backward (as their gradient
+           would be taken at the new value) until they are recomputed with eval()
+        """
+        if _ops.TRACK_COMP and (self.operation is not None or (type(item) == Array and item.track_grads)):
+            if self.operation is None and self.track_grads:
+                raise ValueError("in-place assignment of a tracked value on a trainable leaf")
+            prev = _wrap(self.value, self.track_grads)
+            prev.name = self.name
+            prev.operation, prev.input, prev.params = self.operation, self.input, self.params
+            prev._version, prev._input_versions = self._version, self._input_versions
+            node = _ops.SetItem.apply(prev, key, item)
+            self._value, self.operation, self.input, self.params = node._value, node.operation, node.input, node.params
+            self.track_grads = node.track_grads
+            self._input_versions = node._input_versions
+            self._backward_cache = None
+            self._version += 1
+            return
+        if not self.value.flags.writeable:
+            # values viewing the memory of another node are copied on write
+            self._value = np.array(self._value)
+            _memory.count_copy(self._value.nbytes)
         if type(item) == Array:
             self.value[key] = item.value
         else:
             self.value[key] = item
+        self._version += 1
 
     def __delitem__(self, key):
         del self.value[key]
 
+    def materialize(self) -> "Array":
+        """
+        computes the value of a node recorded in lazy mode (see utils.materialize)
+        """
+        if self._value is None:
+            _utils.materialize(self)
+        return self
+
+    def mark_dirty(self):
+        """
+        marks the value as changed, needed after modifying the underlying numpy array in place
+        """
+        self._version += 1
+
     def eval(self, **env):
         """
         evaluate at given environment
+
+        -> only nodes depending on changed leaves are recomputed (leaves given in env always count as changed) \n
+        -> values modified in place (e.g. Array.value[0] = 1) have to be marked with mark_dirty()
         
         Args:
             env: environment, e.g. x=1, y=2
         """
-        def iter(node:Array):
-            if type(node) != Array:
-                return
-            for input in (node.input or []):
-                iter(input)
+        for node in _utils.topological_order(self):
             if node.operation != None:
+                versions = _input_versions(node)
+                if versions == node._input_versions:
+                    continue
                 input = tuple(item.value if type(item) == Array else item for item in node.input)
-                node.value, node.params = node.operation._eval(input)
-            elif node.name == None:
-                return
-            elif node.name in env:
+                value, node.params = node.operation._eval(input)
+                # stored without copying as in Operation.apply, shape-only operations stay views
+                node._value = _ops._output(value, input)
+                node._version += 1
+                node._input_versions = versions
+            elif node.name != None and node.name in env:
                 node.value = env[node.name]
-        iter(self)
 
     @abstractmethod
     def diff(self, var:str):
@@ -137,140 +227,150 @@ class Array():
         """
         pass
 
-    def backward(self, gradient:np.ndarray=None):
+    def backward(self, gradient:np.ndarray=None, incremental:bool=False):
         """
         calculates gradient using autodiff in backward mode
 
         -> gradient can be found on leaf nodes using expr.gradient \n
-        -> only works after eval has been calculated or rigth after graph creation
+        -> only works after eval has been calculated or rigth after graph creation \n
+        -> with incremental=True the input gradients of every node are cached and reused as long as
+           neither the node inputs nor the incoming gradient changed since the last backward pass
+
+        Args:
+            gradient: gradient of the top level node (ignored for scalars)
+            incremental: reuse cached gradients of unchanged subgraphs
         """
+        # nodes recorded in lazy mode are computed first, backward needs their params
+        self.materialize()
         if self.shape == (1,):
             self.gradient = np.ones(self.shape)
+            seed = _SCALAR_SEED
         else:
             self.gradient = gradient
+            # the caller may modify its array after the call, the cache compares against a snapshot
+            seed = np.array(gradient) if incremental else gradient
 
-        def iter(node:Array):
+        def iter(node:Array, incoming):
             if type(node) != Array:
                 return
             if node.operation is None:
                 return
-            input = tuple(item.value if type(item) == Array else item for item in node.input)
-            grads = node.operation._backward(node.gradient, input, node.params)
+            needs_grad = _needs_grad(node)
+            if not any(needs_grad):
+                return
+            _check_modified(node)
+            cache = node._backward_cache
+            if incremental:
+                versions = _input_versions(node)
+            if incremental and cache is not None and cache[1] == versions and cache[2] == needs_grad \
+                    and _same_gradient(cache[0], incoming):
+                grads = cache[3]
+            else:
+                input = tuple(item.value if type(item) == Array else item for item in node.input)
+                grads = node.operation._backward(node.gradient, input, node.params, needs_grad)
+                node._backward_cache = (incoming, versions, needs_grad, grads) if incremental else None
             for i in range(0, len(node.input)):
                 if type(node.input[i]) != Array:
                     continue
-                if node.input[i].track_grads == False:
+                if node.input[i].track_grads == False or grads[i] is None:
+                    # inputs without a gradient (e.g. integer indices of gather)
                     continue
                 elif node.input[i].operation is None:
-                    if node.input[i].gradient is None:
-                        node.input[i].gradient = np.zeros(node.input[i].shape)
-                    node.input[i].gradient += grads[i]
+                    _add_gradient(node.input[i], grads[i])
                 else:
                     node.input[i].gradient = grads[i]
-                iter(node.input[i])
-        iter(self)
+                iter(node.input[i], grads[i])
+        iter(self, seed)
 
     def __add__(self, p):
-        from autodiff.operations import Add, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Add.apply(self, Expand.apply(p, self.shape))
+            return _ops.Add.apply(self, _ops.Expand.apply(p, self.shape))
         if self.shape == (1,):
-            return Add.apply(Expand.apply(self, p.shape), p)
-        return Add.apply(self, p)
+            return _ops.Add.apply(_ops.Expand.apply(self, p.shape), p)
+        return _ops.Add.apply(self, p)
     
     def __radd__(self, p):
-        from autodiff.operations import Add, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Add.apply(Expand.apply(p, self.shape), self)
+            return _ops.Add.apply(_ops.Expand.apply(p, self.shape), self)
         if self.shape == (1,):
-            return Add.apply(p, Expand.apply(self, p.shape))
-        return Add.apply(p, self)
+            return _ops.Add.apply(p, _ops.Expand.apply(self, p.shape))
+        return _ops.Add.apply(p, self)
 
     def __sub__(self, p):
-        from autodiff.operations import Sub, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Sub.apply(self, Expand.apply(p, self.shape))
+            return _ops.Sub.apply(self, _ops.Expand.apply(p, self.shape))
         if self.shape == (1,):
-            return Sub.apply(Expand.apply(self, p.shape), p)
-        return Sub.apply(self, p)
+            return _ops.Sub.apply(_ops.Expand.apply(self, p.shape), p)
+        return _ops.Sub.apply(self, p)
 
     def __rsub__(self, p):
-        from autodiff.operations import Sub, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Sub.apply(Expand.apply(p, self.shape), self)
+            return _ops.Sub.apply(_ops.Expand.apply(p, self.shape), self)
         if self.shape == (1,):
-            return Sub.apply(p, Expand.apply(self, p.shape))
-        return Sub.apply(p, self)
+            return _ops.Sub.apply(p, _ops.Expand.apply(self, p.shape))
+        return _ops.Sub.apply(p, self)
 
     def __mul__(self, p):
-        from autodiff.operations import Multiply, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Multiply.apply(self, Expand.apply(p, self.shape))
+            return _ops.Multiply.apply(self, _ops.Expand.apply(p, self.shape))
         if self.shape == (1,):
-            return Multiply.apply(Expand.apply(self, p.shape), p)
-        return Multiply.apply(self, p)
+            return _ops.Multiply.apply(_ops.Expand.apply(self, p.shape), p)
+        return _ops.Multiply.apply(self, p)
     
     def __rmul__(self, p):
-        from autodiff.operations import Multiply, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Multiply.apply(Expand.apply(p, self.shape), self)
+            return _ops.Multiply.apply(_ops.Expand.apply(p, self.shape), self)
         if self.shape == (1,):
-            return Multiply.apply(p, Expand.apply(self, p.shape))
-        return Multiply.apply(p, self)
+            return _ops.Multiply.apply(p, _ops.Expand.apply(self, p.shape))
+        return _ops.Multiply.apply(p, self)
 
     def __truediv__(self, p):
-        from autodiff.operations import Divide, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Divide.apply(self, Expand.apply(p, self.shape))
+            return _ops.Divide.apply(self, _ops.Expand.apply(p, self.shape))
         if self.shape == (1,):
-            return Divide.apply(Expand.apply(self, p.shape), p)
-        return Divide.apply(self, p)
+            return _ops.Divide.apply(_ops.Expand.apply(self, p.shape), p)
+        return _ops.Divide.apply(self, p)
     
     def __rtruediv__(self, p):
-        from autodiff.operations import Divide, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Divide.apply(Expand.apply(p, self.shape), self)
+            return _ops.Divide.apply(_ops.Expand.apply(p, self.shape), self)
         if self.shape == (1,):
-            return Divide.apply(p, Expand.apply(self, p.shape))
-        return Divide.apply(p, self)
+            return _ops.Divide.apply(p, _ops.Expand.apply(self, p.shape))
+        return _ops.Divide.apply(p, self)
     
     def __pow__(self, p):
-        from autodiff.operations import Pow, Expand
         if type(p) == int or type(p) == float:
             p = Array(p)
         if p.shape == (1,):
-            return Pow.apply(self, Expand.apply(p, self.shape))
+            return _ops.Pow.apply(self, _ops.Expand.apply(p, self.shape))
         if self.shape == (1,):
-            return Pow.apply(Expand.apply(self, p.shape), p)
-        return Pow.apply(self, p)
+            return _ops.Pow.apply(_ops.Expand.apply(self, p.shape), p)
+        return _ops.Pow.apply(self, p)
 
     def __matmul__(self, p):
-        from autodiff.operations import Matmul
-        return Matmul.apply(self,p)
+        return _ops.Matmul.apply(self,p)
 
     def __rmatmul__(self, p):
-        from autodiff.operations import Matmul
-        return Matmul.apply(p,self)
+        return _ops.Matmul.apply(p,self)
 
     def T(self):
-        from autodiff.operations import Transpose
-        return Transpose.apply(self)
+        return _ops.Transpose.apply(self)
 
     def __str__(self):
         return self.value.__str__()
@@ -297,6 +397,85 @@ class Array():
 def from_numpy(arr:np.ndarray, track_grads=False) -> Array:
     return Array(arr, dtype=arr.dtype, track_grads=track_grads)
 
+_SCALAR_SEED = object()
+
+def _input_versions(node:Array) -> tuple:
+    return tuple(item._version if type(item) == Array else None for item in node.input)
+
+def _needs_grad(node:Array) -> tuple:
+    return tuple(type(item) == Array and item.track_grads for item in node.input)
+
+def _same_gradient(a, b) -> bool:
+    if a is b:
+        return True
+    return type(a) == np.ndarray and type(b) == np.ndarray and np.array_equal(a, b)
+
+def _is_index_array(key) -> bool:
+    if type(key) == Array:
+        key = key.value
+    elif type(key) == list:
+        key = np.asarray(key)
+    return type(key) == np.ndarray and np.issubdtype(key.dtype, np.integer)
+
+def _add_gradient(leaf:Array, grad):
+    """
+    accumulates a dense, sparse or slice gradient on a leaf node
+
+    -> sparse gradients stay sparse as long as the leaf only received sparse gradients
+    """
+    if type(grad) == SparseGradient:
+        if leaf._gradient is None:
+            leaf._gradient = grad
+        elif type(leaf._gradient) == SparseGradient:
+            leaf._gradient = leaf._gradient.concat(grad)
+        else:
+            np.add.at(leaf._gradient, grad.indices, grad.values)
+        return
+    if leaf._gradient is None:
+        leaf._gradient = _memory.default_pool.acquire(leaf.shape, leaf.dtype, zero=True)
+    elif type(leaf._gradient) == SparseGradient:
+        leaf._gradient = leaf._gradient.to_dense()
+    if type(grad) == SliceGradient:
+        # all slices of a leaf are scattered into its single gradient buffer
+        grad.add_to(leaf._gradient)
+        return
+    leaf._gradient += grad
+
+def _check_modified(node:Array):
+    # results of operations assigned in place (see Array.__setitem__) after node consumed them
+    # no longer hold the value node was computed from
+    if node._input_versions is None:
+        return
+    for item, version in zip(node.input, node._input_versions):
+        if type(item) == Array and item.operation is not None and item._version != version:
+            raise ValueError("an input needed for the gradient was modified in place after it was used, call eval() first")
+
+def _wrap(value:np.ndarray, track_grads:bool = False) -> Array:
+    """
+    wraps a numpy result into an Array without copying or validating it
+    """
+    arr = Array.__new__(Array)
+    arr._value = np.atleast_1d(value)
+    arr._gradient = None
+    arr.name = None
+    arr.track_grads = track_grads
+    arr.operation = None
+    arr.input = None
+    arr.params = None
+    arr._version = 0
+    arr._input_versions = None
+    arr._backward_cache = None
+    return arr
+
+def _deferred(shape:tuple, dtype, track_grads:bool = False) -> Array:
+    """
+    creates a node without value, the value is computed on first access (lazy mode)
+    """
+    arr = _wrap(np.empty(0), track_grads)
+    arr._value = None
+    arr._meta = (shape, np.dtype(dtype))
+    return arr
+
 class Tree():
     def __init__(self, expr:Array):
         self.expr = expr
@@ -305,4 +484,67 @@ class Tree():
         return self.expr._str()
 
     def _repr_latex_(self):
-        return self.expr._latex()
\ No newline at end of file
+        return self.expr._latex()
+
+class SparseGradient():
+    def __init__(self, indices:np.ndarray, values:np.ndarray, shape:tuple):
+        """
+        gradient only non-zero in some rows (first axis) of an Array
+
+        Args:
+            indices: 1d array of row indices (may contain duplicates)
+            values: gradient rows, shape (len(indices), *shape[1:])
+            shape: shape of the dense gradient
+        """
+        self.indices = indices
+        self.values = values
+        self.shape = shape
+
+    def concat(self, other:"SparseGradient") -> "SparseGradient":
+        return SparseGradient(np.concatenate((self.indices, other.indices)), np.concatenate((self.values, other.values)), self.shape)
+
+    def coalesce(self) -> "SparseGradient":
+        """
+        sums the rows of duplicate indices
+        """
+        indices, inverse = np.unique(self.indices, return_inverse=True)
+        values = np.zeros((indices.shape[0], *self.values.shape[1:]), dtype=self.values.dtype)
+        np.add.at(values, inverse, self.values)
+        return SparseGradient(indices, values, self.shape)
+
+    def to_dense(self) -> np.ndarray:
+        out = np.zeros(self.shape, dtype=self.values.dtype)
+        np.add.at(out, self.indices, self.values)
+        return out
+
+
+class SliceGradient():
+    def __init__(self, key, values:np.ndarray, shape:tuple):
+        """
+        gradient only non-zero in a basic slice of an Array
+
+        -> slices of the same Array are scattered into one gradient buffer instead of one dense gradient each
+
+        Args:
+            key: basic index (integers, slices, None, ...) selecting the slice
+            values: gradient of the slice
+            shape: shape of the dense gradient
+        """
+        self.key = key
+        self.values = values
+        self.shape = shape
+
+    def add_to(self, out:np.ndarray):
+        view = out[self.key]
+        view += np.reshape(self.values, np.shape(view))
+
+    def to_dense(self) -> np.ndarray:
+        out = np.zeros(self.shape, dtype=self.values.dtype)
+        self.add_to(out)
+        return out
+
+
+# operations and graph utilities depend on Array, they are bound once after the class definitions
+import autodiff.operations as _ops
+import autodiff.utils as _utils
+import autodiff.memory as _memory
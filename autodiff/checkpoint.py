@@ -0,0 +1,137 @@
+import json
+import numpy as np
+from autodiff.array import Array, _wrap
+from autodiff.utils import topological_order
+import autodiff.operations as operations
+
+_MAGIC = b"ADGRAPH1"
+_ALIGN = 64
+
+def _align(n:int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+def save(path:str, expr:Array):
+    """
+    stores a tracked computation graph together with its leaf values in one file
+
+    -> file layout: magic, header length, json header, 64-byte aligned raw buffers \n
+    -> values of nodes created by operations are not stored, they are recomputed on load
+
+    Args:
+        path: output file
+        expr: top level node of the graph
+    """
+    nodes = topological_order(expr)
+    index = {id(node): i for i, node in enumerate(nodes)}
+    buffers = []
+
+    def add_buffer(arr:np.ndarray) -> int:
+        buffers.append(np.ascontiguousarray(arr))
+        return len(buffers) - 1
+
+    def encode(item):
+        if type(item) == Array:
+            return {"node": index[id(item)]}
+        if type(item) == tuple:
+            return {"tuple": [encode(i) for i in item]}
+        if type(item) == np.ndarray:
+            return {"buffer": add_buffer(item)}
+        if isinstance(item, (bool, int, float, str)) or item is None:
+            return {"value": item}
+        if isinstance(item, np.generic):
+            return {"value": item.item()}
+        if type(item) == slice:
+            return {"slice": [encode(item.start), encode(item.stop), encode(item.step)]}
+        if item is Ellipsis:
+            return {"ellipsis": True}
+        raise ValueError(f"can not serialize input of type {type(item)}")
+
+    header_nodes = []
+    for node in nodes:
+        entry = {"name": node.name, "track_grads": node.track_grads}
+        if node.operation is None:
+            entry["op"] = None
+            entry["value"] = add_buffer(node.value)
+        else:
+            entry["op"] = operations._op_key(node.operation)
+            entry["inputs"] = [encode(i) for i in node.input]
+        header_nodes.append(entry)
+
+    # buffer offsets are relative to the (aligned) end of the header
+    layout = []
+    offset = 0
+    for buf in buffers:
+        layout.append({"offset": offset, "dtype": buf.dtype.str, "shape": list(buf.shape)})
+        offset = _align(offset + buf.nbytes)
+    header = json.dumps({"nodes": header_nodes, "buffers": layout, "output": index[id(expr)]}).encode()
+    data_start = _align(len(_MAGIC) + 8 + len(header))
+
+    with open(path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for buf, info in zip(buffers, layout):
+            f.write(b"\0" * (data_start + info["offset"] - f.tell()))
+            f.write(buf.tobytes())
+
+def load(path:str, mmap_mode:str = "c") -> Array:
+    """
+    loads a graph stored with save
+
+    -> leaf values are memory-maps into the file, no weights are copied on load
+
+    Args:
+        path: file written by save
+        mmap_mode: numpy memmap mode for leaf values ("r" read-only, "c" copy-on-write)
+
+    Returns:
+        top level node of the graph
+    """
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("invalid graph file")
+        size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        header = json.loads(f.read(size))
+    data_start = _align(len(_MAGIC) + 8 + size)
+
+    def buffer(i:int) -> np.ndarray:
+        info = header["buffers"][i]
+        shape = tuple(info["shape"])
+        if int(np.prod(shape)) == 0:
+            return np.zeros(shape, dtype=info["dtype"])
+        return np.memmap(path, dtype=info["dtype"], mode=mmap_mode, offset=data_start+info["offset"], shape=shape)
+
+    nodes = []
+
+    def decode(item):
+        if "node" in item:
+            return nodes[item["node"]]
+        if "tuple" in item:
+            return tuple(decode(i) for i in item["tuple"])
+        if "buffer" in item:
+            return np.array(buffer(item["buffer"]))
+        if "slice" in item:
+            return slice(*(decode(i) for i in item["slice"]))
+        if "ellipsis" in item:
+            return Ellipsis
+        return item["value"]
+
+    for entry in header["nodes"]:
+        if entry["op"] is None:
+            node = _wrap(buffer(entry["value"]), entry["track_grads"])
+        else:
+            # checkpoints written before operations were keyed by module store the bare name of built-in operations
+            op = operations.OPERATIONS.get(entry["op"]) or operations.OPERATIONS.get("autodiff.operations." + entry["op"])
+            if op is None:
+                raise ValueError(f"unknown operation {entry['op']}, custom operations have to be defined before loading")
+            input = tuple(decode(i) for i in entry["inputs"])
+            value, params = op._eval(tuple(item.value if type(item) == Array else item for item in input))
+            node = _wrap(value, entry["track_grads"])
+            node.operation = op
+            node.input = input
+            node.params = params
+            node._input_versions = tuple(item._version if type(item) == Array else None for item in input)
+        node.name = entry["name"]
+        nodes.append(node)
+    return nodes[header["output"]]
@@ -0,0 +1,257 @@
+import os
+import numpy as np
+from autodiff.array import Array
+from autodiff.utils import topological_order
+from autodiff.operations import _op_key
+
+_ALIGN = 64
+
+# forward expressions, {0}, {1}, ... are the operation inputs
+_FORWARD = {
+    "Add": "{0} + {1}",
+    "Sub": "{0} - {1}",
+    "Multiply": "{0} * {1}",
+    "Divide": "{0} / {1}",
+    "Pow": "{0} ** {1}",
+    "Ln": "np.log({0})",
+    "Expand": "np.full({1}, {0})",
+    "Exp": "np.exp({0})",
+    "Sin": "np.sin({0})",
+    "Cos": "np.cos({0})",
+    "Tan": "np.tan({0})",
+    "MeanSquaredError": "np.sum(np.square({0} - {1})).reshape(1) / {0}.size",
+    "Transpose": "np.transpose({0})",
+    "Matmul": "np.matmul({0}, {1})",
+    "Reshape": "np.reshape({0}, {1})",
+    "Slice": "np.atleast_1d({0}[{1}])",
+    "Relu": "np.maximum({0}, 0)",
+    "Maximum": "np.maximum({0}, {1})",
+    "Where": "np.where({0}, {1}, {2})",
+    "Clip": "np.clip({0}, {1}, {2})",
+    "Abs": "np.abs({0})",
+    "Sigmoid": "1 / (1 + np.exp(-{0}))",
+    "Softmax": "_softmax({0})",
+    "Mean": "np.sum({0}).reshape(1) / {0}.size",
+    "Sum": "np.sum({0}).reshape(1)",
+}
+
+# input gradients, g is the incoming gradient and o the operation output
+_BACKWARD = {
+    "Add": ("g", "g"),
+    "Sub": ("g", "-g"),
+    "Multiply": ("g * {1}", "g * {0}"),
+    "Divide": ("g / {1}", "-g / {1} * o"),
+    "Pow": ("g * {1} * {0} ** ({1} - 1)", "g * np.log({0}) * o"),
+    "Ln": ("g / {0}",),
+    "Expand": ("np.sum(g).reshape(1)",),
+    "Exp": ("g * o",),
+    "Sin": ("g * np.cos({0})",),
+    "Cos": ("-g * np.sin({0})",),
+    "Tan": ("g * (1 + o * o)",),
+    "MeanSquaredError": ("g * (2 / {0}.size) * ({0} - {1})", "-g * (2 / {0}.size) * ({0} - {1})"),
+    "Transpose": ("np.transpose(g)",),
+    "Matmul": ("np.matmul(g, np.swapaxes({1}, -1, -2))", "np.matmul(np.swapaxes({0}, -1, -2), g)"),
+    "Reshape": ("np.reshape(g, {0}.shape)",),
+    "Relu": ("np.where({0} > 0, g, 0)",),
+    "Maximum": ("np.where({0} >= {1}, g, 0)", "np.where({0} >= {1}, 0, g)"),
+    "Where": (None, "np.where({0}, g, 0)", "np.where({0}, 0, g)"),
+    "Clip": ("np.where(np.clip({0}, {1}, {2}) == {0}, g, 0)",),
+    "Abs": ("np.where({0} >= 0, g, -g)",),
+    "Sigmoid": ("g * o * (1 - o)",),
+    "Softmax": ("o * (g - np.sum(g * o))",),
+    "Mean": ("np.full({0}.shape, g / {0}.size)",),
+    "Sum": ("np.full({0}.shape, g)",),
+}
+
+_HELPERS = {
+    "_softmax": '''def _softmax(x):
+    e = np.exp(x - np.max(x))
+    return e / np.sum(e)
+''',
+}
+
+
+def export(expr:Array, path:str, inputs:list = None, backward:bool = False):
+    """
+    writes a computation graph as a standalone python module made of plain numpy calls
+
+    -> the module defines forward(*inputs) and optionally backward(*inputs, gradient=None) \n
+    -> all other leaves (weights, constants) are stored in <module>_weights.npy next to the module
+       and memory-mapped on import \n
+    -> shapes are fixed to the ones of the traced graph, operations without a numpy template
+       call into autodiff.operations
+
+    Args:
+        expr: top level node of a tracked graph
+        path: output file, e.g. "model.py"
+        inputs: leaves (Arrays or names) that become arguments of forward, defaults to all named leaves without track_grads
+        backward: also generate backward returning the gradients of all trainable leaves (see PARAMETERS)
+    """
+    nodes = topological_order(expr)
+    index = {id(node): i for i, node in enumerate(nodes)}
+    leaves = [node for node in nodes if node.operation is None]
+    if inputs is None:
+        args = [node for node in leaves if node.name is not None and not node.track_grads]
+    else:
+        args = [node for node in leaves if node.name in inputs or any(node is i for i in inputs)]
+        if len(args) != len(inputs):
+            raise ValueError("inputs have to be leaves of the graph")
+    arg_ids = set(id(node) for node in args)
+    params = [node for node in leaves if node.track_grads and id(node) not in arg_ids]
+    names = {}
+    for node in nodes:
+        names[id(node)] = f"v{index[id(node)]}"
+    for i, node in enumerate(args):
+        names[id(node)] = node.name if node.name is not None and node.name.isidentifier() else f"x{i}"
+
+    buffers = []
+    offset = 0
+
+    stored = {}
+
+    def store(arr:np.ndarray) -> str:
+        nonlocal offset
+        if id(arr) in stored:
+            return stored[id(arr)]
+        key = id(arr)
+        arr = np.ascontiguousarray(arr)
+        start = -(-offset // _ALIGN) * _ALIGN
+        buffers.append((start, arr))
+        offset = start + arr.nbytes
+        stored[key] = f"_W[{start}:{start+arr.nbytes}].view({arr.dtype.str!r}).reshape({arr.shape!r})"
+        return stored[key]
+
+    weights = []
+    for node in leaves:
+        if id(node) not in arg_ids:
+            weights.append(f"{names[id(node)]} = {store(node.value)}" + (f"  # {node.name}" if node.name else ""))
+
+    def literal(item) -> str:
+        if type(item) == Array:
+            return names[id(item)]
+        if type(item) == tuple:
+            if all(isinstance(i, (bool, int, float, str)) or i is None for i in item):
+                return repr(item)
+            return "(" + "".join(literal(i) + ", " for i in item) + ")"
+        if type(item) == np.ndarray:
+            return store(item)
+        if isinstance(item, np.generic):
+            return repr(item.item())
+        if isinstance(item, (bool, int, float, str, slice)) or item is None or item is Ellipsis:
+            return repr(item)
+        raise ValueError(f"can not export input of type {type(item)}")
+
+    helpers = set()
+    fallback = False
+
+    def forward_lines(keep_params:bool) -> list:
+        nonlocal fallback
+        lines = []
+        for node in nodes:
+            if node.operation is None:
+                continue
+            op = _template_name(node.operation)
+            input = [literal(i) for i in node.input]
+            name = names[id(node)]
+            if op in _FORWARD and not (keep_params and op not in _BACKWARD):
+                code = _FORWARD[op].format(*input)
+                helpers.update(h for h in _HELPERS if h + "(" in code)
+                lines.append(f"{name} = {code}")
+            else:
+                fallback = True
+                call = f"_ops.OPERATIONS[{_op_key(node.operation)!r}]._eval(({''.join(i + ', ' for i in input)}))"
+                if keep_params:
+                    lines.append(f"{name}, p{index[id(node)]} = {call}")
+                else:
+                    lines.append(f"{name} = {call}[0]")
+        return lines
+
+    def backward_lines() -> list:
+        nonlocal fallback
+        lines = []
+        received = set()
+        out = names[id(expr)]
+        lines.append(f"g{index[id(expr)]} = np.ones({out}.shape, dtype={out}.dtype) if gradient is None else np.asarray(gradient)")
+        received.add(id(expr))
+        for node in reversed(nodes):
+            if node.operation is None or id(node) not in received:
+                continue
+            needs_grad = tuple(type(i) == Array and i.track_grads for i in node.input)
+            if not any(needs_grad):
+                continue
+            op = _template_name(node.operation)
+            input = [literal(i) for i in node.input]
+            g = f"g{index[id(node)]}"
+            if op in _BACKWARD:
+                grads = [_substitute(template, g, names[id(node)]).format(*input) if template else None for template in _BACKWARD[op]]
+            else:
+                fallback = True
+                call = f"_ops.OPERATIONS[{_op_key(node.operation)!r}]._backward({g}, ({''.join(i + ', ' for i in input)}), p{index[id(node)]}, {needs_grad!r})"
+                lines.append(f"grads = [g.to_dense() if hasattr(g, 'to_dense') else g for g in {call}]")
+                grads = [f"grads[{i}]" for i in range(0, len(node.input))]
+            for i, item in enumerate(node.input):
+                if not needs_grad[i]:
+                    continue
+                target = f"g{index[id(item)]}"
+                if id(item) in received:
+                    lines.append(f"{target} = {target} + {grads[i]}")
+                else:
+                    lines.append(f"{target} = {grads[i]}")
+                    received.add(id(item))
+        grads = [f"g{index[id(p)]}" if id(p) in received else "None" for p in params]
+        lines.append(f"return ({''.join(g + ', ' for g in grads)})")
+        return lines
+
+    signature = ", ".join(names[id(node)] for node in args)
+    forward = forward_lines(False)
+    if backward:
+        backward_body = forward_lines(True) + backward_lines()
+
+    module = os.path.splitext(os.path.basename(path))[0]
+    weights_file = module + "_weights.npy"
+    src = ["# generated by autodiff.codegen.export, do not edit", "import os", "import numpy as np"]
+    if fallback:
+        src.append("import autodiff.operations as _ops")
+    src += ["", f"PARAMETERS = {tuple(p.name for p in params)!r}", ""]
+    if buffers:
+        src.append(f"_W = np.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), {weights_file!r}), mmap_mode=\"r\")")
+        src += weights
+    src.append("")
+    for h in sorted(helpers):
+        src += [_HELPERS[h]]
+    src.append(f"def forward({signature}):")
+    src += [f"    {n} = np.atleast_1d(np.asarray({n}))" for n in (names[id(node)] for node in args)]
+    src += ["    " + line for line in forward]
+    src += [f"    return {names[id(expr)]}", ""]
+    if backward:
+        src.append(f"def backward({signature + ', ' if signature else ''}gradient=None):")
+        src += [f"    {n} = np.atleast_1d(np.asarray({n}))" for n in (names[id(node)] for node in args)]
+        src += ["    " + line for line in backward_body]
+        src.append("")
+
+    data = np.zeros(-(-offset // _ALIGN) * _ALIGN, dtype=np.uint8)
+    for start, arr in buffers:
+        data[start:start+arr.nbytes] = np.frombuffer(arr.tobytes(), dtype=np.uint8)
+    np.save(os.path.join(os.path.dirname(os.path.abspath(path)), weights_file), data)
+    with open(path, "w") as f:
+        f.write("\n".join(src))
+
+def _template_name(operation) -> str:
+    # templates exist for built-in operations only, custom operations may share their names
+    return operation.__name__ if operation.__module__ == "autodiff.operations" else None
+
+def _substitute(code:str, gradient:str, out:str) -> str:
+    # replaces the placeholders g and o of a backward template
+    tokens = []
+    word = ""
+    for ch in code + " ":
+        if ch.isalnum() or ch == "_":
+            word += ch
+            continue
+        if word == "g":
+            word = gradient
+        elif word == "o":
+            word = out
+        tokens.append(word + ch)
+        word = ""
+    return "".join(tokens)[:-1]
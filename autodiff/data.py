@@ -0,0 +1,163 @@
+import threading
+import queue
+import numpy as np
+
+_IDX_DTYPES = {
+    0x08: np.dtype(np.uint8),
+    0x09: np.dtype(np.int8),
+    0x0B: np.dtype(">i2"),
+    0x0C: np.dtype(">i4"),
+    0x0D: np.dtype(">f4"),
+    0x0E: np.dtype(">f8"),
+}
+
+def load_idx(path:str) -> np.memmap:
+    """
+    opens an IDX file (e.g. MNIST) as a read-only memory-map
+
+    Args:
+        path: path to the IDX file
+
+    Returns:
+        memory-mapped array with the shape given in the file header
+    """
+    with open(path, "rb") as f:
+        header = f.read(4)
+        if len(header) != 4 or header[0] != 0 or header[1] != 0:
+            raise ValueError("invalid idx header")
+        if header[2] not in _IDX_DTYPES:
+            raise ValueError("invalid idx dtype")
+        dtype = _IDX_DTYPES[header[2]]
+        ndim = header[3]
+        shape = tuple(int(d) for d in np.frombuffer(f.read(4*ndim), dtype=">u4"))
+    return np.memmap(path, dtype=dtype, mode="r", offset=4+4*ndim, shape=shape)
+
+def load_npy(path:str) -> np.memmap:
+    """
+    opens a .npy file as a read-only memory-map
+
+    Args:
+        path: path to the .npy file
+
+    Returns:
+        memory-mapped array
+    """
+    return np.load(path, mmap_mode="r")
+
+def load(path:str) -> np.memmap:
+    """
+    opens an IDX or .npy dataset as a read-only memory-map (chosen by file extension)
+    """
+    if path.endswith(".npy"):
+        return load_npy(path)
+    return load_idx(path)
+
+def one_hot(labels:np.ndarray, num_classes:int, dtype=np.float32) -> np.ndarray:
+    """
+    vectorized one-hot encoding of integer labels
+
+    Args:
+        labels: integer labels of any shape (a trailing dimension of size 1 is dropped)
+        num_classes: number of classes
+
+    Returns:
+        array of shape (*labels.shape, num_classes)
+    """
+    labels = np.asarray(labels)
+    if labels.ndim > 1 and labels.shape[-1] == 1:
+        labels = labels[..., 0]
+    out = np.zeros((*labels.shape, num_classes), dtype=dtype)
+    np.put_along_axis(out, labels[..., None].astype(np.intp), 1, axis=-1)
+    return out
+
+
+class DataLoader():
+    def __init__(self, *arrays, batch_size:int = 32, shuffle:bool = True, drop_last:bool = False, prefetch:int = 2, transform = None, seed:int = None):
+        """
+        iterates over minibatches of one or more equally long arrays (e.g. memory-mapped images and labels)
+
+        -> batches are contiguous slices and therefore zero-copy views of the underlying arrays \n
+        -> shuffling permutes the order of the batches, not the rows within a batch \n
+        -> the next batches are prepared on a background thread while the current one is used
+
+        Args:
+            arrays: arrays to batch along their first axis
+            batch_size: number of rows per batch
+            shuffle: visit batches in a new random order every epoch
+            drop_last: skip the last batch if it is smaller than batch_size
+            prefetch: number of batches to prepare ahead (0 disables the background thread)
+            transform: optional callable applied to every batch tuple on the background thread
+            seed: seed for the shuffling random generator
+        """
+        if len(arrays) == 0:
+            raise ValueError("at least one array is required")
+        if any(a.shape[0] != arrays[0].shape[0] for a in arrays):
+            raise ValueError("arrays must have the same length")
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        self.arrays = arrays
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.prefetch = prefetch
+        self.transform = transform
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        n = self.arrays[0].shape[0]
+        if self.drop_last:
+            return n // self.batch_size
+        return -(-n // self.batch_size)
+
+    def _batch(self, index:int) -> tuple:
+        start = index * self.batch_size
+        batch = tuple(a[start:start+self.batch_size] for a in self.arrays)
+        if self.transform is not None:
+            return self.transform(*batch)
+        return batch
+
+    def _order(self) -> np.ndarray:
+        if self.shuffle:
+            return self._rng.permutation(len(self))
+        return np.arange(len(self))
+
+    def __iter__(self):
+        order = self._order()
+        if self.prefetch <= 0:
+            for index in order:
+                yield self._batch(index)
+            return
+
+        buffer = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for index in order:
+                    if stop.is_set():
+                        return
+                    buffer.put(self._batch(index))
+            except BaseException as e:
+                buffer.put(e)
+                return
+            buffer.put(done)
+
+        worker = threading.Thread(target=produce, daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # unblock the producer if it is waiting on a full queue
+            while worker.is_alive():
+                try:
+                    buffer.get_nowait()
+                except queue.Empty:
+                    worker.join(0.01)
@@ -0,0 +1,123 @@
+import weakref
+import numpy as np
+
+
+class BufferPool():
+    def __init__(self, max_bytes:int = 1<<30):
+        """
+        size-bucketed pool of numpy buffers reused between training iterations
+
+        -> buffers are bucketed by dtype and size rounded up to the next power of two \n
+        -> acquired arrays are views into a pooled flat buffer, release() returns the buffer to its bucket \n
+        -> buffers that are dropped without release are simply freed by python, the pool keeps no reference to them
+
+        Args:
+            max_bytes: upper limit for the bytes kept in free buffers, larger releases are dropped
+        """
+        self.max_bytes = max_bytes
+        self._free = {}
+        self._live = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_live = 0
+        self.bytes_pooled = 0
+
+    def acquire(self, shape:tuple, dtype = np.float64, zero:bool = False) -> np.ndarray:
+        """
+        returns an array of the given shape backed by a pooled buffer
+
+        Args:
+            shape: array shape
+            dtype: array dtype
+            zero: fill the array with zeros
+        """
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)), 1)
+        bucket = (dtype.str, 1 << (size-1).bit_length())
+        free = self._free.get(bucket)
+        if free:
+            base = free.pop()
+            self.hits += 1
+            self.bytes_pooled -= base.nbytes
+        else:
+            base = np.empty(bucket[1], dtype=dtype)
+            self.misses += 1
+        self._live[id(base)] = (bucket, weakref.ref(base), weakref.finalize(base, self._forget, id(base), base.nbytes))
+        self.bytes_live += base.nbytes
+        arr = base[:size].reshape(shape)
+        if zero:
+            arr.fill(0)
+        return arr
+
+    def release(self, arr:np.ndarray) -> bool:
+        """
+        gives the buffer behind an acquired array back to the pool
+
+        -> the array must not be used afterwards
+
+        Returns:
+            False if the array was not acquired from this pool
+        """
+        base = arr
+        while base.base is not None and id(base) not in self._live:
+            base = base.base
+        entry = self._live.get(id(base))
+        if entry is None or entry[1]() is not base:
+            return False
+        del self._live[id(base)]
+        bucket, _, finalizer = entry
+        finalizer.detach()
+        self.bytes_live -= base.nbytes
+        if self.bytes_pooled + base.nbytes <= self.max_bytes:
+            self._free.setdefault(bucket, []).append(base)
+            self.bytes_pooled += base.nbytes
+        return True
+
+    def _forget(self, key:int, nbytes:int):
+        self._live.pop(key, None)
+        self.bytes_live -= nbytes
+
+    def clear(self):
+        """
+        drops all free buffers
+        """
+        self._free = {}
+        self.bytes_pooled = 0
+
+    def stats(self) -> dict:
+        """
+        allocator statistics (hits, misses, bytes_live, bytes_pooled)
+        """
+        return {"hits": self.hits, "misses": self.misses, "bytes_live": self.bytes_live, "bytes_pooled": self.bytes_pooled}
+
+
+default_pool = BufferPool()
+
+_bytes_copied = 0
+
+def count_copy(nbytes:int):
+    """
+    records a copy of array data made by the library
+    """
+    global _bytes_copied
+    _bytes_copied += nbytes
+
+def copied_bytes(reset:bool = False) -> int:
+    """
+    bytes of array data copied by the library (Array construction, value/gradient conversion,
+    contiguous copies for kernels) since the last reset
+
+    Args:
+        reset: restart counting, e.g. once per training step
+    """
+    global _bytes_copied
+    n = _bytes_copied
+    if reset:
+        _bytes_copied = 0
+    return n
+
+def stats() -> dict:
+    """
+    statistics of the pool used for gradient buffers and the number of copied bytes
+    """
+    return {**default_pool.stats(), "bytes_copied": _bytes_copied}
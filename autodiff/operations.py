@@ -1,8 +1,11 @@
-from autodiff.array import Array
+from autodiff.array import Array, SparseGradient, SliceGradient, _wrap, _deferred
+import autodiff.memory as _memory
 from abc import abstractmethod
 import numpy as np
 
 TRACK_COMP = False
+INFERENCE = False
+LAZY = False
 
 class track_computation:
     def __init__(self):
@@ -14,7 +17,66 @@ class track_computation:
         global TRACK_COMP
         TRACK_COMP = False
 
+class inference:
+    """
+    disables graph construction and gradient tracking inside its scope
+
+    -> operations only evaluate their result, params are dropped and outputs never track gradients
+    """
+    def __init__(self):
+        self._prev = False
+    def __enter__(self):
+        global INFERENCE
+        self._prev = INFERENCE
+        INFERENCE = True
+    def __exit__(self, type, value, traceback):
+        global INFERENCE
+        INFERENCE = self._prev
+
+class lazy:
+    """
+    defers the evaluation of operations inside its scope
+
+    -> operations only record nodes, values are computed once they are requested (Array.value)
+       or with materialize, which optimizes the recorded graph before running it (see utils.materialize) \n
+    -> operations without shape inference (_infer) are evaluated immediately
+    """
+    def __init__(self):
+        self._prev = False
+    def __enter__(self):
+        global LAZY
+        self._prev = LAZY
+        LAZY = True
+    def __exit__(self, type, value, traceback):
+        global LAZY
+        LAZY = self._prev
+
+class _Meta():
+    # shape and dtype of a deferred input, given to _validate_input and _infer in lazy mode
+    def __init__(self, shape:tuple, dtype):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.ndim = len(shape)
+        self.size = int(np.prod(shape))
+
+OPERATIONS = {}
+
+def _op_key(cls) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
 class Operation():
+    """
+    base class of all operations
+
+    -> everything the backward pass needs from the forward pass (outputs, intermediates, factorizations)
+       is returned as params from _eval, _backward must not recompute it
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # operations are looked up by module and name (e.g. when loading checkpoints), defining an operation
+        # again under the same qualified name (re-running a notebook cell, reloading a module) replaces it
+        OPERATIONS[_op_key(cls)] = cls
 
     @classmethod
     def apply(cls, *input):
@@ -27,20 +89,72 @@ class Operation():
         Returns:
             the computed output Array
         """
+        if LAZY and not INFERENCE:
+            arr = cls._defer(input)
+            if arr is not None:
+                return arr
         input_ = tuple(item.value if type(item) == Array else item for item in input)
         cls._validate_input(input_)
         value, params = cls._eval(input_)
+        cls._update(input_, params)
+        value = _output(value, input_)
+        if INFERENCE:
+            return _wrap(value)
         if any(i.track_grads for i in input if type(i) == Array):
+            arr = _wrap(value, track_grads=True)
             if TRACK_COMP:
-                arr = Array(value, track_grads=True)
                 arr.operation = cls
                 arr.input = tuple(input)
                 arr.params = params
-                return arr
-            else:
-                return Array(value, track_grads=True)
+                arr._input_versions = tuple(item._version if type(item) == Array else None for item in input)
+            return arr
         else:
-            return Array(value, track_grads=False)
+            return _wrap(value)
+
+    @classmethod
+    def _defer(cls, input):
+        # records a node without evaluating it, None if the output shape can not be inferred
+        meta = tuple(_Meta(item.shape, item.dtype) if type(item) == Array else item for item in input)
+        try:
+            cls._validate_input(meta)
+        except (ValueError, TypeError, AttributeError):
+            # invalid input or a check that needs values, the eager path reports or handles it
+            return None
+        spec = cls._infer(meta)
+        if spec is None:
+            return None
+        track_grads = any(i.track_grads for i in input if type(i) == Array)
+        arr = _deferred(tuple(spec[0]), spec[1], track_grads)
+        arr.operation = cls
+        arr.input = tuple(input)
+        arr._record = track_grads and TRACK_COMP
+        return arr
+
+    @staticmethod
+    def _infer(input):
+        """
+        output shape and dtype of the operation without evaluating it (used in lazy mode)
+
+        Args:
+            input: input arguments to operation (Arrays are given as objects with shape and dtype)
+
+        Returns:
+            (shape, dtype) or None if unknown
+        """
+        return None
+
+    @staticmethod
+    def _update(input, params):
+        """
+        updates state outside of the graph (e.g. running statistics), called once when the operation is applied
+
+        -> re-evaluations of the node (eval, checkpoint loading, profiling) only call _eval
+
+        Args:
+            input: operation input (Arrays are given as their underlying numpy array)
+            params: parameter object returned from _eval method
+        """
+        return
 
     @staticmethod
     @abstractmethod
@@ -67,7 +181,7 @@ class Operation():
         
         Returns:
             result: the operation result as a numpy array
-            params: a object containing parameters to be used in backward pass
+            params: a object containing parameters to be used in backward pass (saved intermediates)
         """
         pass
 
@@ -83,7 +197,7 @@ class Operation():
 
     @staticmethod
     @abstractmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         """
         computes backward pass for operation with respect to inputs
         
@@ -91,9 +205,10 @@ class Operation():
             gradient: numpy array containing radient for current Array
             input: operation input (Arrays are given as their underlying numpy array)
             params: parameter object returned from _eval method
+            needs_grad: tuple of bools, True for every input whose gradient is used
         
         Returns:
-            a tuple containing gradient with respect to every input as numpy arrays
+            a tuple containing gradient with respect to every input as numpy arrays (None for inputs not needing one)
         """
         pass
 
@@ -118,6 +233,10 @@ class Add(Operation):
     def _eval(input):
         return input[0] + input[1], None
 
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, np.result_type(input[0].dtype, input[1].dtype)
+
     @staticmethod
     def _diff(input, gradient):
         # return Add(self.input[0].diff(var), self.input[1].diff(var))
@@ -129,7 +248,7 @@ class Add(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         return (gradient,gradient)
 
     @staticmethod
@@ -151,6 +270,10 @@ class Sub(Operation):
     def _eval(input):
         return input[0] - input[1], None
 
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, np.result_type(input[0].dtype, input[1].dtype)
+
     @staticmethod
     def _diff(input, gradient):
         # return Sub(self.input[0].diff(var), self.input[1].diff(var))
@@ -162,8 +285,8 @@ class Sub(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        return (gradient,-gradient)
+    def _backward(gradient, input, params, needs_grad):
+        return (gradient, -gradient if needs_grad[1] else None)
 
     @staticmethod
     def _str(input):
@@ -184,6 +307,10 @@ class Multiply(Operation):
     def _eval(input):
         return input[0] * input[1], None
 
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, np.result_type(input[0].dtype, input[1].dtype)
+
     @staticmethod
     def _diff(input, gradient):
         # l = self.input[0]
@@ -203,8 +330,8 @@ class Multiply(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        return (gradient*input[1],gradient*input[0])
+    def _backward(gradient, input, params, needs_grad):
+        return (gradient*input[1] if needs_grad[0] else None, gradient*input[0] if needs_grad[1] else None)
 
     @staticmethod
     def _str(input):
@@ -239,7 +366,12 @@ class Divide(Operation):
 
     @staticmethod
     def _eval(input):
-        return input[0] / input[1], None
+        out = input[0] / input[1]
+        return out, out
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype, input[1].dtype)
 
     @staticmethod
     def _diff(input, gradient):
@@ -260,8 +392,10 @@ class Divide(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        return (gradient/input[1],-gradient*input[0]/input[1]**2)
+    def _backward(gradient, input, params, needs_grad):
+        out = params
+        g = gradient/input[1]
+        return (g if needs_grad[0] else None, -g*out if needs_grad[1] else None)
 
     @staticmethod
     def _str(input):
@@ -288,7 +422,12 @@ class Pow(Operation):
 
     @staticmethod
     def _eval(input):
-        return input[0] ** input[1], None
+        out = input[0] ** input[1]
+        return out, out
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, np.result_type(input[0].dtype, input[1].dtype)
 
     @staticmethod
     def _diff(input, gradient):
@@ -317,10 +456,21 @@ class Pow(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        db = input[1] * input[0]**(input[1]-1)
-        de = np.log(input[0]) * input[0]**input[1]
-        return (gradient*db,gradient*de)
+    def _backward(gradient, input, params, needs_grad):
+        # the exponent gradient (and its log) is skipped for constant exponents
+        out = params
+        b, e = input
+        db = None
+        if needs_grad[0]:
+            # b^(e-1) = out / b, only recomputed where the base is zero
+            nonzero = b != 0
+            power = np.divide(out, b, out=np.zeros(out.shape, dtype=np.result_type(out, np.float32)), where=nonzero)
+            if not np.all(nonzero):
+                zero = ~nonzero
+                power[zero] = b[zero] ** (e[zero]-1)
+            db = gradient * e * power
+        de = gradient * np.log(b) * out if needs_grad[1] else None
+        return (db,de)
 
     @staticmethod
     def _str(input):
@@ -348,6 +498,10 @@ class Ln(Operation):
     def _eval(input):
         return np.log(input[0]), None
 
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype)
+
     @staticmethod
     def _diff(input, gradient):
         # c = self.input[0]
@@ -363,7 +517,7 @@ class Ln(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         return (gradient/input[0],)
 
     @staticmethod
@@ -387,6 +541,10 @@ class Expand(Operation):
     def _eval(input):
         return np.full(input[1], input[0]), None
 
+    @staticmethod
+    def _infer(input):
+        return input[1], input[0].dtype
+
     @staticmethod
     def _diff(input, gradient):
         pass
@@ -396,7 +554,7 @@ class Expand(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         return (np.array(np.sum(gradient)),)
 
     @staticmethod
@@ -415,7 +573,12 @@ class Exp(Operation):
 
     @staticmethod
     def _eval(input):
-        return np.exp(input[0]), None
+        out = np.exp(input[0])
+        return out, out
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype)
 
     @staticmethod
     def _diff(inpit, gradient):
@@ -432,8 +595,9 @@ class Exp(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        return (gradient*np.exp(input[0]),)
+    def _backward(gradient, input, params, needs_grad):
+        out = params
+        return (gradient*out,)
 
     @staticmethod
     def _str(input):
@@ -453,6 +617,10 @@ class Sin(Operation):
     def _eval(input):
         return np.sin(input[0]), None
 
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype)
+
     @staticmethod
     def _diff(input, gradient):
         # c = self.input[0]
@@ -468,7 +636,7 @@ class Sin(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         return (gradient*np.cos(input[0]),)
 
     @staticmethod
@@ -489,6 +657,10 @@ class Cos(Operation):
     def _eval(input):
         return np.cos(input[0]), None
 
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype)
+
     @staticmethod
     def _diff(input, gradient):
         # c = self.input[0]
@@ -504,7 +676,7 @@ class Cos(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         return (-gradient*np.sin(input[0]),)
 
     @staticmethod
@@ -523,7 +695,12 @@ class Tan(Operation):
 
     @staticmethod
     def _eval(input):
-        return np.tan(input[0]), None
+        out = np.tan(input[0])
+        return out, out
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype)
 
     @staticmethod
     def _diff(input, gradient):
@@ -540,8 +717,10 @@ class Tan(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        return (gradient/np.cos(input[0])**2,)
+    def _backward(gradient, input, params, needs_grad):
+        # 1/cos^2 = 1 + tan^2
+        out = params
+        return (gradient*(1+out*out),)
 
     @staticmethod
     def _str(input):
@@ -561,8 +740,12 @@ class MeanSquaredError(Operation):
 
     @staticmethod
     def _eval(input):
-        v = (input[0] - input[1])**2
-        return np.array([np.sum(v)/v.size]), None
+        diff = input[0] - input[1]
+        return np.array([np.sum(diff*diff)/diff.size]), diff
+
+    @staticmethod
+    def _infer(input):
+        return (1,), _float_type(input[0].dtype, input[1].dtype)
 
     @staticmethod
     def _diff(input, gradient):
@@ -573,9 +756,10 @@ class MeanSquaredError(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        v = (input[0] - input[1]) * 2
-        return (gradient*v/v.size,-gradient*v/v.size)
+    def _backward(gradient, input, params, needs_grad):
+        diff = params
+        v = gradient * (2/diff.size) * diff
+        return (v, -v if needs_grad[1] else None)
 
     @staticmethod
     def _str(input):
@@ -595,6 +779,10 @@ class Transpose(Operation):
     def _eval(input):
         return np.transpose(input[0]), None
 
+    @staticmethod
+    def _infer(input):
+        return input[0].shape[::-1], input[0].dtype
+
     @staticmethod
     def _diff(input):
         pass
@@ -604,7 +792,7 @@ class Transpose(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         return (np.transpose(gradient),)
 
     @staticmethod
@@ -625,7 +813,8 @@ class Inv(Operation):
 
     @staticmethod
     def _eval(input):
-        return np.linalg.inv(input[0]), None
+        inv = np.linalg.inv(input[0])
+        return inv, inv
 
     @staticmethod
     def _diff(input, gradient):
@@ -636,12 +825,10 @@ class Inv(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        inv = np.linalg.inv(input[0])
-        *a, b, c = tuple(i for i in range(len(input[0].shape)))
-        t = np.transpose(inv, (*a,c,b))
-        v = -np.matmul(t, inv)
-        return (np.matmul(gradient, v),)
+    def _backward(gradient, input, params, needs_grad):
+        # d inv(A) = -inv(A) dA inv(A)  =>  grad A = -inv(A)^T G inv(A)^T
+        t = np.swapaxes(params, -1, -2)
+        return (-np.matmul(np.matmul(t, gradient), t),)
 
     @staticmethod
     def _str(input):
@@ -652,6 +839,174 @@ class Inv(Operation):
         return r""+input[0]._latex()+"^-1"
 
 
+class Solve(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if len(input[0].shape) != 2 or input[0].shape[0] != input[0].shape[1]:
+            raise ValueError("solve only allowed for quadratic matricies")
+        if len(input[1].shape) > 2 or input[1].shape[0] != input[0].shape[0]:
+            raise ValueError("dimension error")
+
+    @staticmethod
+    def _eval(input):
+        # the lu factorization and the solution are kept for the backward pass
+        factor = _lu_factor(input[0])
+        x = _lu_solve(factor, input[1])
+        return x, (factor, x)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        # x = A^-1 b  =>  grad b = A^-T G, grad A = -grad b x^T
+        factor, x = params
+        gb = _lu_solve(factor, gradient, trans=True)
+        if not needs_grad[0]:
+            return (None, gb)
+        if len(x.shape) == 1:
+            return (-np.outer(gb, x), gb)
+        return (-np.matmul(gb, x.T), gb)
+
+    @staticmethod
+    def _str(input):
+        return f"solve({input[0]._str()}, {input[1]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r""+input[0]._latex()+"^-1"+input[1]._latex()
+
+
+class Cholesky(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if len(input[0].shape) != 2 or input[0].shape[0] != input[0].shape[1]:
+            raise ValueError("cholesky only allowed for quadratic matricies")
+
+    @staticmethod
+    def _eval(input):
+        L = np.linalg.cholesky(input[0])
+        return L, L
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        # grad A = 1/2 L^-T Phi(L^T G) L^-1 (symmetrized), Phi takes the lower triangle with halved diagonal
+        L = params
+        P = np.tril(np.matmul(L.T, gradient))
+        P[np.diag_indices_from(P)] *= 0.5
+        S = _solve_triangular(L, _solve_triangular(L, P.T, trans=True).T, trans=True)
+        return (0.5 * (S + S.T),)
+
+    @staticmethod
+    def _str(input):
+        return f"cholesky({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"chol("+input[0]._latex()+")"
+
+
+class Slogdet(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if len(input[0].shape) != 2 or input[0].shape[0] != input[0].shape[1]:
+            raise ValueError("slogdet only allowed for quadratic matricies")
+
+    @staticmethod
+    def _eval(input):
+        # log det A from the diagonal of the lu factorization, the factorization is kept for backward
+        factor = _lu_factor(input[0])
+        lu, piv = factor
+        diag = np.diag(lu)
+        sign = np.prod(np.sign(diag)) * (-1)**np.count_nonzero(piv != np.arange(0, len(piv)))
+        logdet = np.sum(np.log(np.abs(diag)))
+        if sign <= 0:
+            raise ValueError("slogdet requires a matrix with positive determinant")
+        return np.array([logdet]), factor
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        # grad A = G * A^-T
+        inv_t = _lu_solve(params, np.eye(input[0].shape[0], dtype=input[0].dtype), trans=True)
+        return (gradient * inv_t,)
+
+    @staticmethod
+    def _str(input):
+        return f"slogdet({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"\log|"+input[0]._latex()+"|"
+
+
+class Lstsq(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if len(input[0].shape) != 2 or input[0].shape[0] < input[0].shape[1]:
+            raise ValueError("lstsq only allowed for matricies with at least as many rows as columns")
+        if len(input[1].shape) > 2 or input[1].shape[0] != input[0].shape[0]:
+            raise ValueError("dimension error")
+
+    @staticmethod
+    def _eval(input):
+        # A = QR, x = R^-1 Q^T b, the factorization is kept for backward
+        Q, R = np.linalg.qr(input[0])
+        x = _solve_triangular(R, Q.T @ input[1], lower=False)
+        return x, (Q, R, x)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        # z = (A^T A)^-1 G, grad b = A z, grad A = r z^T - grad b x^T with residual r = b - A x
+        Q, R, x = params
+        A, b = input
+        y = _solve_triangular(R, gradient, lower=False, trans=True)
+        z = _solve_triangular(R, y, lower=False)
+        gb = Q @ y
+        if not needs_grad[0]:
+            return (None, gb)
+        r = b - A @ x
+        if len(x.shape) == 1:
+            return (np.outer(r, z) - np.outer(gb, x), gb)
+        return (r @ z.T - gb @ x.T, gb)
+
+    @staticmethod
+    def _str(input):
+        return f"lstsq({input[0]._str()}, {input[1]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"lstsq("+input[0]._latex()+", "+input[1]._latex()+")"
+
+
 class Matmul(Operation):
     @staticmethod
     def _validate_input(input):
@@ -663,7 +1018,12 @@ class Matmul(Operation):
 
     @staticmethod
     def _eval(input):
-        return np.matmul(input[0], input[1]), None
+        # BLAS takes C- and F-ordered operands (e.g. transposed views), other strides are copied
+        return np.matmul(_contiguous(input[0]), _contiguous(input[1])), None
+
+    @staticmethod
+    def _infer(input):
+        return np.broadcast_shapes(input[0].shape[:-2], input[1].shape[:-2]) + (input[0].shape[-2], input[1].shape[-1]), np.result_type(input[0].dtype, input[1].dtype)
 
     @staticmethod
     def _diff(input, gradient):
@@ -674,12 +1034,16 @@ class Matmul(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        *a, b, c = tuple(i for i in range(len(input[0].shape)))
-        in0_t = np.transpose(input[0], (*a,c,b))
-        *a, b, c = tuple(i for i in range(len(input[1].shape)))
-        in1_t = np.transpose(input[1], (*a,c,b))
-        return (np.matmul(gradient, in1_t), np.matmul(in0_t, gradient))
+    def _backward(gradient, input, params, needs_grad):
+        grad0 = None
+        grad1 = None
+        if needs_grad[0]:
+            *a, b, c = tuple(i for i in range(len(input[1].shape)))
+            grad0 = np.matmul(gradient, np.transpose(input[1], (*a,c,b)))
+        if needs_grad[1]:
+            *a, b, c = tuple(i for i in range(len(input[0].shape)))
+            grad1 = np.matmul(np.transpose(input[0], (*a,c,b)), gradient)
+        return (grad0, grad1)
 
     @staticmethod
     def _str(input):
@@ -690,17 +1054,88 @@ class Matmul(Operation):
         return r""+input[0]._latex()+"x"+input[1]._latex()
 
 
+class Einsum(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if type(input[0]) != str:
+            raise ValueError("subscripts have to be a string")
+        ins, out = _parse_einsum(input[0], len(input)-1)
+        for subs, arr in zip(ins, input[1:]):
+            if len(set(subs)) != len(subs):
+                raise ValueError("repeated subscripts within one operand are not supported")
+            if len(subs) != len(arr.shape):
+                raise ValueError("subscripts do not match operand dimensions")
+
+    @staticmethod
+    def _eval(input):
+        subscripts, *operands = input
+        ins, out = _parse_einsum(subscripts, len(operands))
+        path = np.einsum_path(subscripts, *operands, optimize="optimal")[0]
+        return np.einsum(subscripts, *operands, optimize=path), (ins, out, path)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        subscripts, *operands = input
+        ins, out, _ = params
+        grads = [None]
+        for k in range(0, len(operands)):
+            if not needs_grad[k+1]:
+                grads.append(None)
+                continue
+            others = [ins[j] for j in range(0, len(operands)) if j != k]
+            # indices only summed over inside operand k are broadcast afterwards
+            available = set(out).union(*others)
+            target = "".join(c for c in ins[k] if c in available)
+            expr = ",".join([out, *others]) + "->" + target
+            g = np.einsum(expr, gradient, *(operands[j] for j in range(0, len(operands)) if j != k), optimize=True)
+            if target != ins[k]:
+                g = np.expand_dims(g, tuple(i for i, c in enumerate(ins[k]) if c not in available))
+                g = np.broadcast_to(g, operands[k].shape)
+            grads.append(g)
+        return tuple(grads)
+
+    @staticmethod
+    def _str(input):
+        return f"einsum({input[0]}, " + ", ".join(i._str() for i in input[1:]) + ")"
+
+    @staticmethod
+    def _latex(input):
+        return r"einsum("+", ".join(i._latex() for i in input[1:])+")"
+
+
 class Reshape(Operation):
     @staticmethod
     def _validate_input(input):
-        if type(input[0]) != np.ndarray:
+        if type(input[0]) != np.ndarray and type(input[0]) != _Meta:
             raise ValueError("only Arrays can be reshaped")
         if type(input[1]) != tuple:
             raise ValueError("dimension not valid")
 
     @staticmethod
     def _eval(input):
-        return np.reshape(input[0], input[1]), input[0].shape
+        value = np.reshape(input[0], input[1])
+        if not np.may_share_memory(value, input[0]):
+            # strides of e.g. a transposed input can not be reshaped as a view
+            _memory.count_copy(value.nbytes)
+        return value, input[0].shape
+
+    @staticmethod
+    def _infer(input):
+        shape = list(input[1])
+        if -1 in shape:
+            known = int(np.prod([n for n in shape if n != -1]))
+            shape[shape.index(-1)] = input[0].size // known if known else 0
+        if int(np.prod(shape)) != input[0].size:
+            raise ValueError("cannot reshape")
+        return tuple(shape), input[0].dtype
 
     @staticmethod
     def _diff(input, gradient):
@@ -711,7 +1146,7 @@ class Reshape(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         return (np.reshape(gradient, params),)
 
     @staticmethod
@@ -757,18 +1192,20 @@ class Conv2D(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
+    def _backward(gradient, input, params, needs_grad):
         in_arr = input[0]
         in_kern = input[1]
-        kern_grad = np.zeros(in_kern.shape, dtype=np.float32)
-        arr_grad = np.zeros(in_arr.shape, dtype=np.float32)
+        kern_grad = np.zeros(in_kern.shape, dtype=np.float32) if needs_grad[1] else None
+        arr_grad = np.zeros(in_arr.shape, dtype=np.float32) if needs_grad[0] else None
         for i in range(0, gradient.shape[2]):
-            for j in range(0, arr_grad.shape[2]):
+            for j in range(0, in_arr.shape[2]):
                 # kernel gradient
-                kern_grad[i,:,:,j] = _conv2D(in_arr[:,:,j], gradient[:,:,i])
+                if needs_grad[1]:
+                    kern_grad[i,:,:,j] = _conv2D(in_arr[:,:,j], gradient[:,:,i])
                 # array gradient
-                kern_rot = np.rot90(in_kern[i,:,:,j], 2)
-                arr_grad[:,:,j] += _conv2D_full(gradient[:,:,i], kern_rot)
+                if needs_grad[0]:
+                    kern_rot = np.rot90(in_kern[i,:,:,j], 2)
+                    arr_grad[:,:,j] += _conv2D_full(gradient[:,:,i], kern_rot)
         return (arr_grad, kern_grad)
 
     @staticmethod
@@ -780,16 +1217,20 @@ class Conv2D(Operation):
         return r"conv2d("+input[0]._latex()+")"
     
 
-class Sigmoid(Operation):
+class MaxPool2D(Operation):
     @staticmethod
     def _validate_input(input):
-        return
+        _validate_pool(input)
 
     @staticmethod
     def _eval(input):
-        in_arr = input[0]
-        out = 1/(1+np.exp(-1*in_arr))
-        return out, out
+        (kh, kw), (sh, sw) = input[1], input[2]
+        windows = np.lib.stride_tricks.sliding_window_view(input[0], (kh, kw), axis=(0, 1))[::sh, ::sw]
+        windows = windows.reshape(*windows.shape[:3], kh*kw)
+        # position inside the window, stored in the smallest unsigned type
+        argmax = np.argmax(windows, axis=-1).astype(np.min_scalar_type(kh*kw-1))
+        out = np.take_along_axis(windows, argmax[..., None].astype(np.intp), axis=-1)[..., 0]
+        return out, argmax
 
     @staticmethod
     def _diff(input, gradient):
@@ -800,36 +1241,36 @@ class Sigmoid(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        out = params
-        return (out*(1-out) * gradient,)
+    def _backward(gradient, input, params, needs_grad):
+        (kh, kw), (sh, sw) = input[1], input[2]
+        H, W, C = input[0].shape
+        Ho, Wo, _ = gradient.shape
+        di, dj = np.divmod(params.astype(np.intp), kw)
+        rows = np.arange(0, Ho)[:, None, None]*sh + di
+        cols = np.arange(0, Wo)[None, :, None]*sw + dj
+        flat = (rows*W + cols)*C + np.arange(0, C)
+        grad = np.bincount(flat.ravel(), weights=gradient.ravel(), minlength=H*W*C)
+        return (grad.reshape(H, W, C).astype(input[0].dtype, copy=False), None, None)
 
     @staticmethod
     def _str(input):
-        return f"sigmoid({input[0]._str()})"
+        return f"maxpool2d({input[0]._str()})"
 
     @staticmethod
     def _latex(input):
-        return r"sigmoid("+input[0]._latex()+")"
-    
+        return r"maxpool2d("+input[0]._latex()+")"
 
-class Softmax(Operation):
+
+class AvgPool2D(Operation):
     @staticmethod
     def _validate_input(input):
-        shp = input[0].shape
-        if len(shp) > 2:
-            raise ValueError("invalid input dimensions")
-        elif len(shp) == 2 and shp[1] != 1 and shp[0] != 1:
-            raise ValueError("invalid input dimensions")
-        else:
-            return
+        _validate_pool(input)
 
     @staticmethod
     def _eval(input):
-        in_arr = input[0]
-        exp = np.exp(in_arr-np.max(in_arr))
-        out = exp / np.sum(exp)
-        return out, out
+        (kh, kw), (sh, sw) = input[1], input[2]
+        windows = np.lib.stride_tricks.sliding_window_view(input[0], (kh, kw), axis=(0, 1))[::sh, ::sw]
+        return np.mean(windows, axis=(-2, -1)), None
 
     @staticmethod
     def _diff(input, gradient):
@@ -840,29 +1281,38 @@ class Softmax(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        out = params
-        return (out*(1-out) * gradient,)
+    def _backward(gradient, input, params, needs_grad):
+        (kh, kw), (sh, sw) = input[1], input[2]
+        Ho, Wo, _ = gradient.shape
+        grad = np.zeros(input[0].shape, dtype=np.result_type(input[0], gradient))
+        scaled = gradient / (kh*kw)
+        for di in range(0, kh):
+            for dj in range(0, kw):
+                grad[di:di+sh*(Ho-1)+1:sh, dj:dj+sw*(Wo-1)+1:sw] += scaled
+        return (grad, None, None)
 
     @staticmethod
     def _str(input):
-        return f"softmax({input[0]._str()})"
+        return f"avgpool2d({input[0]._str()})"
 
     @staticmethod
     def _latex(input):
-        return r"softmax("+input[0]._latex()+")"
-    
+        return r"avgpool2d("+input[0]._latex()+")"
 
-class Mean(Operation):
+
+class Relu(Operation):
     @staticmethod
     def _validate_input(input):
         return
 
     @staticmethod
     def _eval(input):
-        in_arr = input[0]
-        N = in_arr.size
-        return np.sum(in_arr) / N, N
+        mask = input[0] > 0
+        return np.where(mask, input[0], 0), _pack(mask)
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, input[0].dtype
 
     @staticmethod
     def _diff(input, gradient):
@@ -873,29 +1323,32 @@ class Mean(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        in_arr = input[0]
-        N = params
-        return (np.full(in_arr.shape, gradient) / N,)
+    def _backward(gradient, input, params, needs_grad):
+        return (np.where(_unpack(params, input[0].shape), gradient, 0),)
 
     @staticmethod
     def _str(input):
-        return f"mean({input[0]._str()})"
+        return f"relu({input[0]._str()})"
 
     @staticmethod
     def _latex(input):
-        return r"\mean{("+input[0]._latex()+r")}"
-    
+        return r"relu("+input[0]._latex()+")"
 
-class Sum(Operation):
+
+class Maximum(Operation):
     @staticmethod
     def _validate_input(input):
-        return
+        if input[0].shape != input[1].shape:
+            raise ValueError("dimensions do not match")
 
     @staticmethod
     def _eval(input):
-        in_arr = input[0]
-        return np.sum(in_arr), None
+        mask = input[0] >= input[1]
+        return np.where(mask, input[0], input[1]), _pack(mask)
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, np.result_type(input[0].dtype, input[1].dtype)
 
     @staticmethod
     def _diff(input, gradient):
@@ -906,27 +1359,842 @@ class Sum(Operation):
         pass
 
     @staticmethod
-    def _backward(gradient, input, params):
-        in_arr = input[0]
-        return (np.full(in_arr.shape, gradient),)
+    def _backward(gradient, input, params, needs_grad):
+        mask = _unpack(params, input[0].shape)
+        return (np.where(mask, gradient, 0) if needs_grad[0] else None, np.where(mask, 0, gradient) if needs_grad[1] else None)
 
     @staticmethod
     def _str(input):
-        return f"sum({input[0]._str()})"
+        return f"max({input[0]._str()}, {input[1]._str()})"
 
     @staticmethod
     def _latex(input):
-        return r"\sum{("+input[0]._latex()+r")}"
+        return r"\max("+input[0]._latex()+", "+input[1]._latex()+")"
 
 
-def ln(child:Array):
-    return Ln.apply(child)
+class Where(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if np.shape(input[0]) != input[1].shape or input[1].shape != input[2].shape:
+            raise ValueError("dimensions do not match")
 
-def expand(child:Array, dimension:tuple):
-    return Expand.apply(child, dimension)
+    @staticmethod
+    def _eval(input):
+        # the condition is an input already, no mask has to be saved
+        return np.where(input[0], input[1], input[2]), None
 
-def exp(child:Array):
-    return Exp.apply(child)
+    @staticmethod
+    def _infer(input):
+        return input[1].shape, np.result_type(input[1].dtype, input[2].dtype)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        cond = np.asarray(input[0], dtype=bool)
+        return (None, np.where(cond, gradient, 0) if needs_grad[1] else None, np.where(cond, 0, gradient) if needs_grad[2] else None)
+
+    @staticmethod
+    def _str(input):
+        return f"where(..., {input[1]._str()}, {input[2]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"where(..., "+input[1]._latex()+", "+input[2]._latex()+")"
+
+
+class Clip(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if input[1] is not None and input[2] is not None and input[1] > input[2]:
+            raise ValueError("lower bound larger than upper bound")
+
+    @staticmethod
+    def _eval(input):
+        x, lower, upper = input
+        mask = np.ones(x.shape, dtype=bool)
+        if lower is not None:
+            mask &= x >= lower
+        if upper is not None:
+            mask &= x <= upper
+        return np.clip(x, lower, upper), _pack(mask)
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, input[0].dtype
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        return (np.where(_unpack(params, input[0].shape), gradient, 0), None, None)
+
+    @staticmethod
+    def _str(input):
+        return f"clip({input[0]._str()}, {input[1]}, {input[2]})"
+
+    @staticmethod
+    def _latex(input):
+        return r"clip("+input[0]._latex()+f", {input[1]}, {input[2]})"
+
+
+class Abs(Operation):
+    @staticmethod
+    def _validate_input(input):
+        return
+
+    @staticmethod
+    def _eval(input):
+        return np.abs(input[0]), _pack(input[0] >= 0)
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, input[0].dtype
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        return (np.where(_unpack(params, input[0].shape), gradient, -gradient),)
+
+    @staticmethod
+    def _str(input):
+        return f"|{input[0]._str()}|"
+
+    @staticmethod
+    def _latex(input):
+        return r"\left|"+input[0]._latex()+r"\right|"
+
+
+class Sigmoid(Operation):
+    @staticmethod
+    def _validate_input(input):
+        return
+
+    @staticmethod
+    def _eval(input):
+        in_arr = input[0]
+        out = 1/(1+np.exp(-1*in_arr))
+        return out, out
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        out = params
+        return (out*(1-out) * gradient,)
+
+    @staticmethod
+    def _str(input):
+        return f"sigmoid({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"sigmoid("+input[0]._latex()+")"
+    
+
+class Softmax(Operation):
+    @staticmethod
+    def _validate_input(input):
+        shp = input[0].shape
+        if len(shp) > 2:
+            raise ValueError("invalid input dimensions")
+        elif len(shp) == 2 and shp[1] != 1 and shp[0] != 1:
+            raise ValueError("invalid input dimensions")
+        else:
+            return
+
+    @staticmethod
+    def _eval(input):
+        in_arr = input[0]
+        exp = np.exp(in_arr-np.max(in_arr))
+        out = exp / np.sum(exp)
+        return out, out
+
+    @staticmethod
+    def _infer(input):
+        return input[0].shape, _float_type(input[0].dtype)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        # jacobian-vector product without building the jacobian: out*(g - <g, out>)
+        out = params
+        return (out * (gradient - np.sum(gradient*out)),)
+
+    @staticmethod
+    def _str(input):
+        return f"softmax({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"softmax("+input[0]._latex()+")"
+    
+
+class Mean(Operation):
+    @staticmethod
+    def _validate_input(input):
+        return
+
+    @staticmethod
+    def _eval(input):
+        in_arr = input[0]
+        N = in_arr.size
+        return np.sum(in_arr) / N, N
+
+    @staticmethod
+    def _infer(input):
+        return (1,), _float_type(input[0].dtype)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        in_arr = input[0]
+        N = params
+        return (np.full(in_arr.shape, gradient) / N,)
+
+    @staticmethod
+    def _str(input):
+        return f"mean({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"\mean{("+input[0]._latex()+r")}"
+    
+
+class Sum(Operation):
+    @staticmethod
+    def _validate_input(input):
+        return
+
+    @staticmethod
+    def _eval(input):
+        in_arr = input[0]
+        return np.sum(in_arr), None
+
+    @staticmethod
+    def _infer(input):
+        return (1,), np.sum(np.zeros(1, dtype=input[0].dtype)).dtype
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        in_arr = input[0]
+        return (np.full(in_arr.shape, gradient),)
+
+    @staticmethod
+    def _str(input):
+        return f"sum({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"\sum{("+input[0]._latex()+r")}"
+
+
+class BatchNorm(Operation):
+    @staticmethod
+    def _validate_input(input):
+        x, gamma, beta, axes, eps, running_mean, running_var, momentum = input
+        _validate_norm(x, gamma, beta, axes)
+        if (running_mean is None) != (running_var is None):
+            raise ValueError("running mean and variance have to be given together")
+        if running_mean is None and momentum is None:
+            raise ValueError("running statistics required without batch statistics")
+        stats_shape = tuple(n for i, n in enumerate(x.shape) if i not in axes)
+        if running_mean is not None and (running_mean.shape != stats_shape or running_var.shape != stats_shape):
+            raise ValueError("running statistics must have the shape of the normalized features")
+
+    @staticmethod
+    def _eval(input):
+        x, gamma, beta, axes, eps, running_mean, running_var, momentum = input
+        keep = tuple(1 if i in axes else n for i, n in enumerate(x.shape))
+        if momentum is None:
+            # inference, normalize with the running statistics
+            mean = np.reshape(running_mean, keep)
+            inv_std = 1 / np.sqrt(np.reshape(running_var, keep) + eps)
+            return _normalize(x, gamma, beta, mean, inv_std), (mean, inv_std, True, None)
+        mean, var = _moments(x, axes)
+        inv_std = 1 / np.sqrt(var + eps)
+        return _normalize(x, gamma, beta, mean, inv_std), (mean, inv_std, False, var)
+
+    @staticmethod
+    def _update(input, params):
+        # the running statistics move once per application, not when the node is re-evaluated
+        x, running_mean, running_var, momentum = input[0], input[5], input[6], input[7]
+        mean, _, fixed, var = params
+        if fixed or running_mean is None:
+            return
+        n = x.size // mean.size
+        running_mean *= 1 - momentum
+        running_mean += momentum * np.reshape(mean, running_mean.shape)
+        running_var *= 1 - momentum
+        running_var += momentum * n / max(n-1, 1) * np.reshape(var, running_var.shape)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        mean, inv_std, fixed, _ = params
+        return _normalize_backward(gradient, input[0], input[1], input[2], input[3], mean, inv_std, fixed, needs_grad) + (None,)*5
+
+    @staticmethod
+    def _str(input):
+        return f"batchnorm({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"batchnorm("+input[0]._latex()+")"
+
+
+class LayerNorm(Operation):
+    @staticmethod
+    def _validate_input(input):
+        _validate_norm(*input[:4])
+
+    @staticmethod
+    def _eval(input):
+        x, gamma, beta, axes, eps = input
+        mean, var = _moments(x, axes)
+        inv_std = 1 / np.sqrt(var + eps)
+        return _normalize(x, gamma, beta, mean, inv_std), (mean, inv_std)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        mean, inv_std = params
+        return _normalize_backward(gradient, input[0], input[1], input[2], input[3], mean, inv_std, False, needs_grad) + (None,)*2
+
+    @staticmethod
+    def _str(input):
+        return f"layernorm({input[0]._str()})"
+
+    @staticmethod
+    def _latex(input):
+        return r"layernorm("+input[0]._latex()+")"
+
+
+class SoftmaxCrossEntropy(Operation):
+    @staticmethod
+    def _validate_input(input):
+        logits, labels, axis = input
+        if type(axis) != int or axis < -len(logits.shape) or axis >= len(logits.shape):
+            raise ValueError("invalid class axis")
+        if labels.shape == logits.shape:
+            return
+        if not np.issubdtype(labels.dtype, np.integer):
+            raise ValueError("labels have to be one-hot encoded or class indices")
+        if labels.shape != tuple(np.delete(logits.shape, axis)):
+            raise ValueError("label dimension must match logits without class axis")
+
+    @staticmethod
+    def _eval(input):
+        logits, labels, axis = input
+        # log-sum-exp in one pass over the shifted logits
+        shifted = logits - np.max(logits, axis=axis, keepdims=True)
+        exp = np.exp(shifted)
+        norm = np.sum(exp, axis=axis, keepdims=True)
+        log_probs = shifted - np.log(norm)
+        N = logits.size // logits.shape[axis]
+        if labels.shape == logits.shape:
+            loss = -np.sum(labels * log_probs) / N
+        else:
+            loss = -np.sum(np.take_along_axis(log_probs, np.expand_dims(labels, axis), axis=axis)) / N
+        return np.array([loss]), (exp / norm, N)
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        logits, labels, axis = input
+        probs, N = params
+        if labels.shape == logits.shape:
+            grad = probs - labels
+        else:
+            grad = probs.copy()
+            idx = np.expand_dims(labels, axis)
+            np.put_along_axis(grad, idx, np.take_along_axis(grad, idx, axis=axis) - 1, axis=axis)
+        return (grad * (gradient / N), None, None)
+
+    @staticmethod
+    def _str(input):
+        return f"cross_entropy(softmax({input[0]._str()}))"
+
+    @staticmethod
+    def _latex(input):
+        return r"cross\_entropy(softmax("+input[0]._latex()+"))"
+
+
+class Slice(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if not _is_basic_index(input[1]):
+            raise ValueError("only integers, slices, None and ... are supported")
+        np.broadcast_to(np.empty(1), input[0].shape)[input[1]]
+
+    @staticmethod
+    def _eval(input):
+        # basic indexing returns a view
+        return input[0][input[1]], None
+
+    @staticmethod
+    def _infer(input):
+        return np.atleast_1d(np.broadcast_to(np.empty(1), input[0].shape)[input[1]]).shape, input[0].dtype
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        x, key = input
+        rows = _leading_rows(key, x.shape)
+        if rows is not None:
+            # rows of the first axis, no full size buffer needed
+            return (SparseGradient(rows, np.reshape(gradient, (rows.shape[0], *x.shape[1:])), x.shape), None)
+        return (SliceGradient(key, gradient, x.shape), None)
+
+    @staticmethod
+    def _str(input):
+        return f"{input[0]._str()}[...]"
+
+    @staticmethod
+    def _latex(input):
+        return r""+input[0]._latex()+"[...]"
+
+
+class SetItem(Operation):
+    @staticmethod
+    def _validate_input(input):
+        np.broadcast_to(input[2], np.shape(np.broadcast_to(np.empty(1), input[0].shape)[input[1]]))
+
+    @staticmethod
+    def _eval(input):
+        out = np.array(input[0])
+        out[input[1]] = input[2]
+        return out, None
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        x, key, item = input
+        grad_x = None
+        if needs_grad[0]:
+            grad_x = np.array(gradient)
+            grad_x[key] = 0
+        grad_item = _sum_to(np.asarray(gradient[key]), np.shape(item)) if needs_grad[2] else None
+        return (grad_x, None, grad_item)
+
+    @staticmethod
+    def _str(input):
+        return f"{input[0]._str()}[...]=..."
+
+    @staticmethod
+    def _latex(input):
+        return r""+input[0]._latex()+"[...]"
+
+
+class Concatenate(Operation):
+    @staticmethod
+    def _validate_input(input):
+        _validate_join(input)
+        axis = input[0] % len(input[1].shape)
+        for arr in input[2:]:
+            if arr.shape[:axis] != input[1].shape[:axis] or arr.shape[axis+1:] != input[1].shape[axis+1:]:
+                raise ValueError("dimensions do not match")
+
+    @staticmethod
+    def _eval(input):
+        return np.concatenate(input[1:], axis=input[0]), None
+
+    @staticmethod
+    def _infer(input):
+        axis = input[0] % len(input[1].shape)
+        shape = list(input[1].shape)
+        # the module level sum is the Sum operation
+        shape[axis] = int(np.sum([arr.shape[axis] for arr in input[1:]]))
+        return tuple(shape), np.result_type(*(arr.dtype for arr in input[1:]))
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        # the input gradients are views into the incoming gradient
+        axis = input[0]
+        bounds = np.cumsum([arr.shape[axis] for arr in input[1:-1]])
+        return (None, *np.split(gradient, bounds, axis=axis))
+
+    @staticmethod
+    def _str(input):
+        return "concat(" + ", ".join(i._str() for i in input[1:]) + ")"
+
+    @staticmethod
+    def _latex(input):
+        return "concat(" + ", ".join(i._latex() for i in input[1:]) + ")"
+
+
+class Stack(Operation):
+    @staticmethod
+    def _validate_input(input):
+        _validate_join(input)
+        for arr in input[2:]:
+            if arr.shape != input[1].shape:
+                raise ValueError("dimensions do not match")
+
+    @staticmethod
+    def _eval(input):
+        return np.stack(input[1:], axis=input[0]), None
+
+    @staticmethod
+    def _infer(input):
+        shape = list(input[1].shape)
+        shape.insert(input[0] % (len(shape)+1), len(input)-1)
+        return tuple(shape), np.result_type(*(arr.dtype for arr in input[1:]))
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        # the input gradients are views into the incoming gradient
+        axis = input[0] % gradient.ndim
+        return (None, *(gradient[(slice(None),)*axis + (i,)] for i in range(0, len(input)-1)))
+
+    @staticmethod
+    def _str(input):
+        return "stack(" + ", ".join(i._str() for i in input[1:]) + ")"
+
+    @staticmethod
+    def _latex(input):
+        return "stack(" + ", ".join(i._latex() for i in input[1:]) + ")"
+
+
+class Gather(Operation):
+    @staticmethod
+    def _validate_input(input):
+        if len(input[0].shape) < 1:
+            raise ValueError("only Arrays can be indexed")
+        if not np.issubdtype(np.asarray(input[1]).dtype, np.integer):
+            raise ValueError("indices have to be integers")
+
+    @staticmethod
+    def _eval(input):
+        indices = np.asarray(input[1])
+        return np.take(input[0], indices, axis=0), indices
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        indices = params.ravel()
+        values = np.reshape(gradient, (indices.shape[0], *input[0].shape[1:]))
+        return (SparseGradient(indices, values, input[0].shape), None)
+
+    @staticmethod
+    def _str(input):
+        return f"{input[0]._str()}[...]"
+
+    @staticmethod
+    def _latex(input):
+        return r""+input[0]._latex()+"[...]"
+
+
+class Scan(Operation):
+    @staticmethod
+    def _validate_input(input):
+        step_fn, init, xs, stacked = input[:4]
+        if not callable(step_fn):
+            raise ValueError("step function has to be callable")
+        if len(np.shape(xs)) < 1 or np.shape(xs)[0] == 0:
+            raise ValueError("sequence must not be empty")
+
+    @staticmethod
+    def _eval(input):
+        step_fn, init, xs, stacked = input[:4]
+        params = tuple(_wrap(p) for p in input[4:])
+        carries = None
+        with inference():
+            carry = _wrap(init)
+            for t in range(0, xs.shape[0]):
+                carry = step_fn(carry, _wrap(xs[t]), *params)
+                if carries is None:
+                    carries = np.empty((xs.shape[0], *carry.shape), dtype=carry.dtype)
+                carries[t] = carry.value
+        # the stacked carries are all backward needs, with stacked=True they are the output itself
+        if stacked:
+            return carries, carries
+        return carries[-1], carries
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @staticmethod
+    def _backward(gradient, input, params, needs_grad):
+        from autodiff.memory import default_pool
+        global TRACK_COMP, INFERENCE, LAZY
+        step_fn, init, xs, stacked = input[:4]
+        T = xs.shape[0]
+        carries = params
+        grad_xs = np.zeros(xs.shape, dtype=np.result_type(xs, np.float32)) if needs_grad[2] else None
+        grad_params = [np.zeros(np.shape(p), dtype=np.result_type(p, np.float32)) if needs_grad[4+i] else None
+                       for i, p in enumerate(input[4:])]
+        grad_carry = None
+        state = (TRACK_COMP, INFERENCE, LAZY)
+        TRACK_COMP, INFERENCE, LAZY = True, False, False
+        try:
+            # reverse loop, every step is replayed as a small graph and differentiated on its own
+            for t in range(T-1, -1, -1):
+                g = gradient[t] if stacked else (gradient if t == T-1 else None)
+                if grad_carry is not None:
+                    g = grad_carry if g is None else g + grad_carry
+                if g is None:
+                    break
+                prev = _wrap(init if t == 0 else carries[t-1], track_grads=True)
+                x = _wrap(xs[t], track_grads=needs_grad[2])
+                ps = tuple(_wrap(p, track_grads=needs_grad[4+i]) for i, p in enumerate(input[4:]))
+                out = step_fn(prev, x, *ps)
+                if out is prev:
+                    grad_carry = g
+                    continue
+                if out.shape == (1,):
+                    # backward seeds scalar outputs with one
+                    out = out * _wrap(np.asarray(g))
+                out.backward(g)
+                if grad_carry is not None:
+                    default_pool.release(grad_carry)
+                grad_carry = _take_gradient(prev)
+                grad = _take_gradient(x)
+                if grad_xs is not None and grad is not None:
+                    grad_xs[t] += np.reshape(grad, grad_xs[t].shape)
+                    default_pool.release(grad)
+                for acc, p in zip(grad_params, ps):
+                    grad = _take_gradient(p)
+                    if acc is not None and grad is not None:
+                        acc += grad
+                        default_pool.release(grad)
+        finally:
+            TRACK_COMP, INFERENCE, LAZY = state
+        if grad_carry is not None and not needs_grad[1]:
+            grad_carry = None
+        return (None, grad_carry, grad_xs, None, *grad_params)
+
+    @staticmethod
+    def _str(input):
+        return f"scan({input[1]._str() if type(input[1]) == Array else '...'})"
+
+    @staticmethod
+    def _latex(input):
+        return r"scan("+(input[1]._latex() if type(input[1]) == Array else "...")+")"
+
+
+class Context():
+    def __init__(self):
+        """
+        state shared between the forward and backward function of a custom operation
+
+        -> intermediates stored with save_for_backward are available as ctx.saved in backward \n
+        -> during backward ctx.input holds the operation input (Arrays given as numpy arrays) \n
+        -> during backward ctx.needs_input_grad tells for every input whether its gradient is used
+        """
+        self.saved:tuple = ()
+        self.input:tuple = None
+        self.needs_input_grad:tuple = None
+
+    def save_for_backward(self, *values):
+        self.saved = values
+
+
+class CustomOperation(Operation):
+    _forward_fn = None
+    _backward_fn = None
+
+    def __new__(cls, *input):
+        return cls.apply(*input)
+
+    @classmethod
+    def backward(cls, fn):
+        """
+        decorator registering the backward function (ctx, gradient) -> tuple of input gradients
+        """
+        cls._backward_fn = staticmethod(fn)
+        return fn
+
+    @staticmethod
+    def _validate_input(input):
+        return
+
+    @classmethod
+    def _eval(cls, input):
+        ctx = Context()
+        return cls._forward_fn(ctx, *input), ctx
+
+    @staticmethod
+    def _diff(input, gradient):
+        pass
+
+    @staticmethod
+    def _forward(input):
+        pass
+
+    @classmethod
+    def _backward(cls, gradient, input, params, needs_grad):
+        if cls._backward_fn is None:
+            raise NotImplementedError(f"operation {cls.__name__} has no backward")
+        params.input = input
+        params.needs_input_grad = needs_grad
+        grads = cls._backward_fn(params, gradient)
+        return tuple(grads) if type(grads) in (tuple, list) else (grads,)
+
+    @classmethod
+    def _str(cls, input):
+        return f"{cls.__name__}(" + ", ".join(i._str() if type(i) == Array else str(i) for i in input) + ")"
+
+    @classmethod
+    def _latex(cls, input):
+        return cls.__name__ + "(" + ", ".join(i._latex() if type(i) == Array else str(i) for i in input) + ")"
+
+
+def custom_op(forward=None, *, name:str = None, validate = None):
+    """
+    decorator creating an Operation from a forward function (ctx, *input) -> numpy array
+
+    -> the backward function is attached with @op.backward and called as backward(ctx, gradient) \n
+    -> calling the returned operation applies it, e.g. square(x)
+
+    Example:
+        @custom_op
+        def square(ctx, x):
+            ctx.save_for_backward(x)
+            return x*x
+
+        @square.backward
+        def square_backward(ctx, gradient):
+            x, = ctx.saved
+            return (2*x*gradient,)
+
+    Args:
+        forward: forward function, receives Arrays as their underlying numpy arrays
+        name: operation name (defaults to the function name), checkpoints refer to the operation by module and name
+        validate: optional function validating the input tuple, raising on invalid input
+    """
+    def wrap(fn):
+        attrs = {"_forward_fn": staticmethod(fn), "__module__": fn.__module__, "__qualname__": name or fn.__qualname__}
+        if validate is not None:
+            attrs["_validate_input"] = staticmethod(validate)
+        return type(name or fn.__name__, (CustomOperation,), attrs)
+    if forward is None:
+        return wrap
+    return wrap(forward)
+
+
+def ln(child:Array):
+    return Ln.apply(child)
+
+def expand(child:Array, dimension:tuple):
+    return Expand.apply(child, dimension)
+
+def exp(child:Array):
+    return Exp.apply(child)
 
 def sin(child:Array):
     return Sin.apply(child)
@@ -943,18 +2211,98 @@ def transpose(child:Array):
 def inv(child:Array):
     return Inv.apply(child)
 
+def solve(A:Array, b:Array) -> Array:
+    return Solve.apply(A, b)
+
+def cholesky(A:Array) -> Array:
+    return Cholesky.apply(A)
+
+def slogdet(A:Array) -> Array:
+    """
+    log determinant of a matrix with positive determinant (e.g. a covariance matrix)
+
+    -> raises for matrices with negative or zero determinant, the sign is not part of the result
+    """
+    return Slogdet.apply(A)
+
+def lstsq(A:Array, b:Array) -> Array:
+    return Lstsq.apply(A, b)
+
 def matmul(left:Array, right:Array):
     return Matmul.apply(left, right)
 
 def mean_squared_error(output:Array, target:Array):
     return MeanSquaredError.apply(output, target)
 
+def einsum(subscripts:str, *operands:Array) -> Array:
+    return Einsum.apply(subscripts, *operands)
+
+def multi_matmul(*operands:Array) -> Array:
+    """
+    matrix product of all operands, evaluated in the order needing the fewest multiplications
+    """
+    split = _chain_order([o.shape for o in operands])
+    def build(i, j):
+        if i == j:
+            return operands[i]
+        k = split[i][j]
+        return Matmul.apply(build(i, k), build(k+1, j))
+    return build(0, len(operands)-1)
+
 def reshape(child:Array, new_shape:tuple):
     return Reshape.apply(child, new_shape)
 
 def conv2D(arr:Array, kernel:Array):
     return Conv2D.apply(arr, kernel)
 
+def max_pool2D(arr:Array, size = 2, stride = None) -> Array:
+    """
+    max pooling over (H, W, C) feature maps
+
+    Args:
+        arr: input of shape (H, W, C)
+        size: window size, int or (height, width)
+        stride: window step, int or (height, width), defaults to size
+    """
+    size, stride = _pool_args(size, stride)
+    return MaxPool2D.apply(arr, size, stride)
+
+def avg_pool2D(arr:Array, size = 2, stride = None) -> Array:
+    """
+    average pooling over (H, W, C) feature maps
+
+    Args:
+        arr: input of shape (H, W, C)
+        size: window size, int or (height, width)
+        stride: window step, int or (height, width), defaults to size
+    """
+    size, stride = _pool_args(size, stride)
+    return AvgPool2D.apply(arr, size, stride)
+
+def relu(arr:Array) -> Array:
+    return Relu.apply(arr)
+
+def maximum(a:Array, b:Array) -> Array:
+    return Maximum.apply(a, b)
+
+def where(condition, a:Array, b:Array) -> Array:
+    """
+    elementwise a where condition is true, b otherwise
+
+    Args:
+        condition: boolean array (or Array) with the shape of a and b, it receives no gradient
+    """
+    return Where.apply(condition, a, b)
+
+def clip(arr:Array, lower:float = None, upper:float = None) -> Array:
+    return Clip.apply(arr, lower, upper)
+
+def absolute(arr:Array) -> Array:
+    """
+    elementwise absolute value (exported as autodiff.abs)
+    """
+    return Abs.apply(arr)
+
 def sigmoid(arr: Array) -> Array:
     return Sigmoid.apply(arr)
 
@@ -967,6 +2315,290 @@ def mean(arr: Array) -> Array:
 def sum(arr: Array) -> Array:
     return Sum.apply(arr)
 
+def batch_norm(arr:Array, gamma:Array = None, beta:Array = None, running_mean:np.ndarray = None, running_var:np.ndarray = None,
+               momentum:float = 0.1, eps:float = 1e-5, axis = 0, training:bool = True) -> Array:
+    """
+    batch normalization, normalizes every feature over the batch axes and applies gamma * x + beta
+
+    -> in training the statistics of the batch are used and running_mean/running_var are updated in place \n
+    -> with training=False or inside inference() the running statistics are used
+
+    Args:
+        arr: input, e.g. (batch, features) or (H, W, C) with axis=(0, 1)
+        gamma: optional scale, broadcastable to arr
+        beta: optional shift, broadcastable to arr
+        running_mean: optional running mean with the shape of the features (arr.shape without axis)
+        running_var: optional running variance with the shape of the features
+        momentum: weight of the batch statistics in the running statistics update
+        eps: added to the variance
+        axis: batch axis or tuple of axes
+    """
+    if INFERENCE or not training:
+        momentum = None
+    return BatchNorm.apply(arr, gamma, beta, _norm_axes(arr, axis), eps, running_mean, running_var, momentum)
+
+def layer_norm(arr:Array, gamma:Array = None, beta:Array = None, eps:float = 1e-5, axis = -1) -> Array:
+    """
+    layer normalization, normalizes over the feature axes of every sample and applies gamma * x + beta
+
+    Args:
+        arr: input, e.g. (batch, features)
+        gamma: optional scale, broadcastable to arr
+        beta: optional shift, broadcastable to arr
+        eps: added to the variance
+        axis: normalized axis or tuple of axes
+    """
+    return LayerNorm.apply(arr, gamma, beta, _norm_axes(arr, axis), eps)
+
+def softmax_cross_entropy(logits:Array, labels:Array, axis:int = -1) -> Array:
+    """
+    mean cross entropy between softmax(logits) and labels along the class axis
+
+    Args:
+        logits: unnormalized scores, e.g. (batch, classes)
+        labels: one-hot labels with the same shape as logits or integer class indices
+        axis: class axis of logits
+    """
+    return SoftmaxCrossEntropy.apply(logits, labels, axis)
+
+def gather(table:Array, indices) -> Array:
+    return Gather.apply(table, indices)
+
+def concatenate(arrays:list, axis:int = 0) -> Array:
+    return Concatenate.apply(axis, *arrays)
+
+def stack(arrays:list, axis:int = 0) -> Array:
+    return Stack.apply(axis, *arrays)
+
+def split(arr:Array, sections, axis:int = 0) -> list:
+    """
+    splits arr into views along axis (see np.split)
+
+    Args:
+        arr: input
+        sections: number of equal sections or sorted split indices
+        axis: split axis
+    """
+    n = arr.shape[axis]
+    if isinstance(sections, (int, np.integer)):
+        if n % sections != 0:
+            raise ValueError("array split does not result in an equal division")
+        bounds = list(range(0, n+1, n // sections))
+    else:
+        bounds = [0, *sections, n]
+    axis = axis % len(arr.shape)
+    return [Slice.apply(arr, (slice(None),)*axis + (slice(bounds[i], bounds[i+1]),)) for i in range(0, len(bounds)-1)]
+
+def scan(step_fn, init:Array, xs:Array, params:tuple = (), stacked:bool = True) -> Array:
+    """
+    runs step_fn over the first axis of xs, carry_t = step_fn(carry_t-1, xs[t], *params)
+
+    -> the steps do not build graph nodes, only the carries are kept in one stacked array \n
+    -> backward replays the steps in reverse order one at a time, the recursion depth does not grow with the sequence \n
+    -> Arrays used by step_fn have to be passed in params to receive gradients
+
+    Args:
+        step_fn: function (carry, x, *params) -> new carry, written with autodiff operations
+        init: initial carry
+        xs: sequence, stacked along the first axis
+        params: Arrays passed to every step (e.g. weights)
+        stacked: return all carries stacked along a new first axis, otherwise only the last carry
+    """
+    return Scan.apply(step_fn, init, xs, stacked, *params)
+
+
+_INPLACE = {Add: np.add, Sub: np.subtract, Multiply: np.multiply, Divide: np.divide, Pow: np.power,
+            Ln: np.log, Exp: np.exp, Sin: np.sin, Cos: np.cos, Tan: np.tan, Maximum: np.maximum, Abs: np.absolute}
+
+_SCIPY_LINALG = None
+
+def _scipy_linalg():
+    """
+    scipy.linalg, imported on first use so importing autodiff stays cheap
+    """
+    global _SCIPY_LINALG
+    if _SCIPY_LINALG is None:
+        import scipy.linalg
+        _SCIPY_LINALG = scipy.linalg
+    return _SCIPY_LINALG
+
+def _lu_factor(A:np.ndarray):
+    # lu factorization with partial pivoting, reused by the backward pass
+    return _scipy_linalg().lu_factor(A)
+
+def _lu_solve(factor, b:np.ndarray, trans:bool = False):
+    return _scipy_linalg().lu_solve(factor, b, trans=1 if trans else 0)
+
+def _solve_triangular(T:np.ndarray, b:np.ndarray, lower:bool = True, trans:bool = False, unit_diagonal:bool = False):
+    return _scipy_linalg().solve_triangular(T, b, lower=lower, trans=1 if trans else 0, unit_diagonal=unit_diagonal)
+
+def _parse_einsum(subscripts:str, n:int) -> tuple:
+    subscripts = subscripts.replace(" ", "")
+    if "." in subscripts:
+        raise ValueError("ellipsis is not supported in einsum subscripts")
+    if "->" in subscripts:
+        lhs, out = subscripts.split("->")
+    else:
+        lhs = subscripts
+        letters = lhs.replace(",", "")
+        out = "".join(sorted(c for c in set(letters) if letters.count(c) == 1))
+    ins = lhs.split(",")
+    if len(ins) != n:
+        raise ValueError("number of subscripts does not match number of operands")
+    return ins, out
+
+def _chain_order(shapes:list) -> list:
+    """
+    optimal parenthesization of a matrix chain (dynamic programming over the classic matrix-chain problem)
+
+    Returns:
+        split table, split[i][j] is the position to split the product of matrices i..j
+    """
+    n = len(shapes)
+    dims = [shapes[0][-2]] + [s[-1] for s in shapes]
+    cost = [[0] * n for _ in range(n)]
+    split = [[0] * n for _ in range(n)]
+    for length in range(1, n):
+        for i in range(0, n-length):
+            j = i + length
+            cost[i][j] = None
+            for k in range(i, j):
+                c = cost[i][k] + cost[k+1][j] + dims[i]*dims[k+1]*dims[j+1]
+                if cost[i][j] is None or c < cost[i][j]:
+                    cost[i][j] = c
+                    split[i][j] = k
+    return split
+
+def _norm_axes(arr, axis) -> tuple:
+    ndim = len(arr.shape)
+    axes = (axis,) if isinstance(axis, (int, np.integer)) else tuple(axis)
+    return tuple(sorted(int(a) % ndim for a in axes))
+
+def _validate_norm(x, gamma, beta, axes):
+    if type(axes) != tuple or len(axes) == 0 or any(a < 0 or a >= len(x.shape) for a in axes):
+        raise ValueError("invalid axis")
+    for p in (gamma, beta):
+        if p is not None and np.broadcast_shapes(x.shape, p.shape) != x.shape:
+            raise ValueError("gamma and beta have to be broadcastable to the input")
+
+def _moments(x:np.ndarray, axes:tuple) -> tuple:
+    # mean and variance over axes in float64, the variance is taken of the centered input in a second pass
+    # (single pass raw moments E[x^2]-E[x]^2 cancel for inputs with a large mean and a small spread),
+    # this needs a float64 temporary of the input size
+    dtype = np.result_type(x, np.float32)
+    mean = np.mean(x, axis=axes, keepdims=True, dtype=np.float64)
+    centered = np.subtract(x, mean, dtype=np.float64)
+    var = np.mean(np.square(centered, out=centered), axis=axes, keepdims=True)
+    return mean.astype(dtype), var.astype(dtype)
+
+def _normalize(x, gamma, beta, mean, inv_std) -> np.ndarray:
+    out = x - mean
+    out *= inv_std
+    if gamma is not None:
+        out *= gamma
+    if beta is not None:
+        out += beta
+    return out
+
+def _sum_to(grad:np.ndarray, shape:tuple) -> np.ndarray:
+    # sums a gradient over the axes its input was broadcast along
+    lead = len(grad.shape) - len(shape)
+    axes = tuple(range(0, lead)) + tuple(lead+i for i, n in enumerate(shape) if n == 1 and grad.shape[lead+i] != 1)
+    return np.reshape(np.sum(grad, axis=axes), shape)
+
+def _normalize_backward(gradient, x, gamma, beta, axes, mean, inv_std, fixed, needs_grad) -> tuple:
+    xhat = x - mean
+    xhat *= inv_std
+    dgamma = _sum_to(gradient*xhat, gamma.shape) if gamma is not None and needs_grad[1] else None
+    dbeta = _sum_to(gradient, beta.shape) if beta is not None and needs_grad[2] else None
+    dx = None
+    if needs_grad[0]:
+        dxhat = gradient * gamma if gamma is not None else gradient
+        if fixed:
+            dx = dxhat * inv_std
+        else:
+            # closed form gradient of (x-mean)/std w.r.t. x
+            dx = dxhat - np.mean(dxhat, axis=axes, keepdims=True)
+            dx -= xhat * np.mean(dxhat*xhat, axis=axes, keepdims=True)
+            dx *= inv_std
+    return (dx, dgamma, dbeta)
+
+def _is_basic_index(key) -> bool:
+    items = key if type(key) == tuple else (key,)
+    return all(i is None or i is Ellipsis or type(i) == slice or isinstance(i, (int, np.integer)) and not isinstance(i, bool) for i in items)
+
+def _leading_rows(key, shape:tuple) -> np.ndarray:
+    # row indices if key only selects along the first axis, otherwise None
+    items = key if type(key) == tuple else (key,)
+    if len(items) == 0 or items[0] is None or items[0] is Ellipsis:
+        return None
+    if any(not (i is Ellipsis or i == slice(None)) for i in items[1:]):
+        return None
+    return np.atleast_1d(np.arange(0, shape[0])[items[0]])
+
+def _validate_join(input):
+    if not isinstance(input[0], (int, np.integer)):
+        raise ValueError("axis has to be an integer")
+    if len(input) < 2:
+        raise ValueError("at least one Array is required")
+
+def _output(value, input:tuple) -> np.ndarray:
+    # operation results are not copied, views of inputs (reshape, transpose, slices) are made read-only
+    # so writing to an output never changes an input behind the graph's back
+    value = np.atleast_1d(value)
+    for item in input:
+        if type(item) != np.ndarray:
+            continue
+        if value is item:
+            value = item.view()
+        elif value.base is None or not np.may_share_memory(value, item):
+            continue
+        value.flags.writeable = False
+        break
+    return value
+
+def _contiguous(arr:np.ndarray) -> np.ndarray:
+    # copies only arrays the kernel can not use directly
+    if arr.flags.c_contiguous or arr.flags.f_contiguous:
+        return arr
+    _memory.count_copy(arr.nbytes)
+    return np.ascontiguousarray(arr)
+
+def _take_gradient(arr:Array) -> np.ndarray:
+    # detaches the dense gradient of a temporary leaf
+    grad = arr._gradient
+    arr._gradient = None
+    if type(grad) == SparseGradient or type(grad) == SliceGradient:
+        return grad.to_dense()
+    return grad
+
+def _pack(mask:np.ndarray) -> np.ndarray:
+    # boolean masks are saved with one bit per element
+    return np.packbits(mask, axis=None)
+
+def _unpack(packed:np.ndarray, shape:tuple) -> np.ndarray:
+    return np.unpackbits(packed, count=int(np.prod(shape))).reshape(shape).view(bool)
+
+def _float_type(*dtypes):
+    # dtype of a floating point ufunc result
+    return np.result_type(*dtypes, np.float16)
+
+def _pool_args(size, stride) -> tuple:
+    size = (size, size) if isinstance(size, (int, np.integer)) else tuple(size)
+    if stride is None:
+        stride = size
+    stride = (stride, stride) if isinstance(stride, (int, np.integer)) else tuple(stride)
+    return tuple(int(i) for i in size), tuple(int(i) for i in stride)
+
+def _validate_pool(input):
+    if len(input[0].shape) != 3:
+        raise ValueError("invalid input dimensions")
+    if type(input[1]) != tuple or type(input[2]) != tuple or len(input[1]) != 2 or len(input[2]) != 2:
+        raise ValueError("size and stride have to be pairs")
+    if min(input[1]) < 1 or min(input[2]) < 1:
+        raise ValueError("size and stride have to be positive")
+    if input[1][0] > input[0].shape[0] or input[1][1] > input[0].shape[1]:
+        raise ValueError("window larger than input")
 
 def _conv2D(arr:np.ndarray, kern:np.ndarray):
     res_shape = (arr.shape[0]-kern.shape[0]+1, arr.shape[1]-kern.shape[1]+1)
@@ -0,0 +1,164 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import numpy as np
+from autodiff.array import Array, SparseGradient
+from autodiff.memory import default_pool
+
+
+class DataParallel():
+    def __init__(self, loss_fn, params:list, workers:int = None, lr:float = 0.01, update = None):
+        """
+        data-parallel trainer sharding every minibatch over a pool of worker processes
+
+        -> parameter values are moved into shared memory, workers see every update without copies \n
+        -> every worker writes its leaf gradients into its own slot of a shared gradient buffer,
+           the slots are summed in the main process and the update is applied once \n
+        -> the update is the gradient of the mean loss over the batch, independent of the number of workers:
+           a worker averages the gradients of the losses returned by loss_fn, the slots are weighted by shard size \n
+        -> workers are forked, loss_fn may therefore close over the given params (e.g. module level weights)
+
+        Args:
+            loss_fn: function taking a shard of the batch arrays and returning the mean loss of the shard as Array
+                     or an iterable of per-sample loss Arrays
+            params: trainable leaf Arrays used by loss_fn
+            workers: number of worker processes (defaults to the number of cpus)
+            lr: learning rate of the default gradient descent update
+            update: optional function(value, gradient) updating a parameter value in place
+        """
+        if len(params) == 0:
+            raise ValueError("at least one parameter is required")
+        self.loss_fn = loss_fn
+        self.params = list(params)
+        self.workers = workers or os.cpu_count() or 1
+        self.lr = lr
+        self.update = update
+
+        # shared parameter values and per worker gradient slots
+        self._shm = []
+        self._grads = []
+        for p in self.params:
+            value = p.value
+            shm = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+            shared = np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)
+            shared[...] = value
+            p._value = shared
+            self._shm.append(shm)
+            shm = shared_memory.SharedMemory(create=True, size=max(value.nbytes*self.workers, 1))
+            grads = np.ndarray((self.workers, *value.shape), dtype=value.dtype, buffer=shm.buf)
+            self._grads.append(grads)
+            self._shm.append(shm)
+
+        ctx = mp.get_context("fork")
+        self._conns = []
+        self._procs = []
+        for k in range(0, self.workers):
+            parent, child = ctx.Pipe()
+            slots = [g[k] for g in self._grads]
+            proc = ctx.Process(target=_worker, args=(child, self.loss_fn, self.params, slots), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    def step(self, *batch) -> float:
+        """
+        computes gradients for one minibatch on all workers and applies a single parameter update
+
+        Args:
+            batch: arrays sharing the batch dimension as first axis (e.g. images, labels)
+
+        Returns:
+            mean loss over the batch
+        """
+        if self._procs is None:
+            raise ValueError("trainer is closed")
+        n = batch[0].shape[0]
+        bounds = np.linspace(0, n, self.workers+1).astype(int)
+        for k, conn in enumerate(self._conns):
+            conn.send(tuple(b[bounds[k]:bounds[k+1]] for b in batch))
+        # shards are weighted by their share of the batch
+        weights = np.diff(bounds) / max(n, 1)
+        loss = 0.0
+        error = None
+        for k, conn in enumerate(self._conns):
+            res = conn.recv()
+            if isinstance(res, BaseException):
+                error = res
+                continue
+            total, count = res
+            if count > 0:
+                loss += weights[k] * total / count
+        if error is not None:
+            raise error
+
+        for p, grads in zip(self.params, self._grads):
+            grad = np.tensordot(weights.astype(grads.dtype), grads, axes=1)
+            if self.update is not None:
+                self.update(p._value, grad)
+            else:
+                p._value -= self.lr * grad
+            p.mark_dirty()
+        return loss
+
+    def close(self):
+        """
+        stops the workers and moves the parameter values back into private memory
+        """
+        if self._procs is None:
+            return
+        for conn in self._conns:
+            conn.send(None)
+            conn.close()
+        for proc in self._procs:
+            proc.join()
+        self._procs = None
+        for p in self.params:
+            p._value = np.array(p._value)
+        self._grads = None
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+def _worker(conn, loss_fn, params:list, slots:list):
+    while True:
+        shard = conn.recv()
+        if shard is None:
+            break
+        try:
+            for p in params:
+                if type(p._gradient) == np.ndarray:
+                    default_pool.release(p._gradient)
+                p._gradient = None
+            total = 0.0
+            count = 0
+            if shard[0].shape[0] > 0:
+                losses = loss_fn(*shard)
+                if type(losses) == Array:
+                    losses = (losses,)
+                for loss in losses:
+                    loss.backward()
+                    total += float(np.sum(loss.value))
+                    count += 1
+            # gradient of the mean of the returned losses
+            for p, slot in zip(params, slots):
+                if p._gradient is None:
+                    slot.fill(0)
+                elif type(p._gradient) == SparseGradient:
+                    slot.fill(0)
+                    np.add.at(slot, p._gradient.indices, p._gradient.values)
+                    slot /= count
+                else:
+                    np.divide(p._gradient, count, out=slot)
+            conn.send((total, count))
+        except Exception as e:
+            conn.send(e)
+    conn.close()
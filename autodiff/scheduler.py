@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from autodiff.array import Array, SparseGradient, SliceGradient, _add_gradient, _needs_grad, _input_versions
+from autodiff.operations import Matmul, Conv2D, Inv, _output
+from autodiff.utils import topological_order
+
+
+def estimate_cost(node:Array) -> int:
+    """
+    rough number of scalar operations needed to evaluate a node
+    """
+    input = tuple(i.value for i in node.input if type(i) == Array)
+    if node.operation == Matmul:
+        a, b = input
+        return int(np.prod(a.shape[:-1])) * a.shape[-1] * b.shape[-1]
+    if node.operation == Conv2D:
+        return node.value.size * input[1][0].size
+    if node.operation == Inv:
+        return input[0].size * input[0].shape[-1]
+    return sum(i.size for i in input)
+
+
+class Scheduler():
+    def __init__(self, workers:int = None, threshold:int = 1<<16):
+        """
+        executes independent branches of a computation graph concurrently on a thread pool
+
+        -> numpy kernels release the GIL, so large operations run in parallel \n
+        -> operations cheaper than threshold (see estimate_cost) run inline on the calling thread
+
+        Args:
+            workers: number of threads (defaults to ThreadPoolExecutor default)
+            threshold: minimal estimated cost for an operation to be dispatched to the pool
+        """
+        self.threshold = threshold
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _run(self, ready:list, pending:dict, work, finish):
+        running = {}
+        while ready or running:
+            while ready:
+                node = ready.pop()
+                if estimate_cost(node) >= self.threshold:
+                    running[self._executor.submit(work, node)] = node
+                    continue
+                for user in finish(node, work(node)):
+                    pending[id(user)] -= 1
+                    if pending[id(user)] == 0:
+                        ready.append(user)
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    for user in finish(node, future.result()):
+                        pending[id(user)] -= 1
+                        if pending[id(user)] == 0:
+                            ready.append(user)
+
+    def eval(self, expr:Array, **env):
+        """
+        evaluate at given environment (see Array.eval)
+
+        Args:
+            expr: top level node
+            env: environment, e.g. x=1, y=2
+        """
+        nodes = topological_order(expr)
+        for node in nodes:
+            if node.operation is None and node.name != None and node.name in env:
+                node.value = env[node.name]
+        nodes = [node for node in nodes if node.operation is not None]
+        pending = {}
+        users = {}
+        for node in nodes:
+            inputs = {id(i): i for i in node.input if type(i) == Array and i.operation is not None}
+            pending[id(node)] = len(inputs)
+            for i in inputs.values():
+                users.setdefault(id(i), []).append(node)
+        ready = [node for node in nodes if pending[id(node)] == 0]
+
+        def work(node:Array):
+            input = tuple(item.value if type(item) == Array else item for item in node.input)
+            return node.operation._eval(input), input
+
+        def finish(node:Array, result):
+            (value, node.params), input = result
+            # stored without copying as in Operation.apply, shape-only operations stay views
+            node._value = _output(value, input)
+            node._version += 1
+            # inputs are final once a node runs, recorded as in Array.eval
+            node._input_versions = _input_versions(node)
+            return users.get(id(node), ())
+
+        self._run(ready, pending, work, finish)
+
+    def backward(self, expr:Array, gradient:np.ndarray = None):
+        """
+        calculates gradient using autodiff in backward mode (see Array.backward)
+
+        -> gradients of nodes used by several operations are summed
+        """
+        expr.materialize()
+        if expr.shape == (1,):
+            expr.gradient = np.ones(expr.shape)
+        else:
+            expr.gradient = gradient
+        if expr.operation is None:
+            return
+
+        # count gradient contributions every tracked node receives
+        pending = {id(expr): 0}
+        nodes = [expr]
+        for node in nodes:
+            for input in node.input:
+                if type(input) != Array or input.track_grads == False or input.operation is None:
+                    continue
+                if id(input) not in pending:
+                    pending[id(input)] = 0
+                    nodes.append(input)
+                pending[id(input)] += 1
+        received = set([id(expr)])
+        # nodes whose gradient is a buffer allocated here, slice gradients are scattered into it in place
+        owned = set()
+
+        def work(node:Array):
+            if id(node) not in received:
+                # only got None gradients (e.g. as integer indices of gather)
+                return (None,) * len(node.input)
+            input = tuple(item.value if type(item) == Array else item for item in node.input)
+            return node.operation._backward(node.gradient, input, node.params, _needs_grad(node))
+
+        def finish(node:Array, grads):
+            ready = []
+            for i in range(0, len(node.input)):
+                input = node.input[i]
+                if type(input) != Array or input.track_grads == False:
+                    continue
+                if grads[i] is None:
+                    if input.operation is not None:
+                        ready.append(input)
+                    continue
+                if input.operation is None:
+                    _add_gradient(input, grads[i])
+                    continue
+                if id(input) in received:
+                    if type(grads[i]) == SliceGradient:
+                        if id(input) not in owned:
+                            input.gradient = np.array(input.gradient)
+                            owned.add(id(input))
+                        grads[i].add_to(input.gradient)
+                    else:
+                        grad = grads[i].to_dense() if type(grads[i]) == SparseGradient else grads[i]
+                        input.gradient = input.gradient + grad
+                        owned.add(id(input))
+                else:
+                    input.gradient = grads[i]
+                    received.add(id(input))
+                    if type(grads[i]) == SparseGradient or type(grads[i]) == SliceGradient:
+                        owned.add(id(input))
+                ready.append(input)
+            return ready
+
+        self._run([expr], pending, work, finish)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
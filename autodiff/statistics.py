@@ -1,7 +1,7 @@
-from autodiff import variable
-from autodiff.utils import get_vars
+from autodiff.array import Array
+from autodiff import operations as _ops
+from autodiff.utils import get_vars, topological_order
 import numpy as np
-import math
 
 class Function():
     def __init__(self, dim:int, *args):
@@ -103,6 +103,48 @@ class Function():
         jac = self.jacobian(**env)
         return np.matmul(np.matmul(jac, cov), np.transpose(jac))
 
+    def monte_carlo(self, covmat, pos, samples:int = 100000, chunk_size:int = 10000, executor = None, seed:int = None):
+        """
+        propagates the input covariance through the (nonlinear) function by sampling
+
+        -> inputs are drawn from a normal distribution around pos, all func[i] are evaluated
+           on a whole chunk of samples at once \n
+        -> output statistics are merged chunk by chunk (see CovarianceAccumulator), memory is bounded by chunk_size
+
+        param:
+            covmat : covariance-matrix for input variables as numpy array
+            pos : space-vector (in order of variables, given as 1d numpy array)
+            samples : number of samples
+            chunk_size : samples evaluated at once
+            executor : optional concurrent.futures executor evaluating the chunks in parallel, e.g. a ProcessPoolExecutor
+            seed : seed of the random generator
+
+        return:
+            mean-vector (1d numpy array) and covariance-matrix (2d numpy array)
+        """
+        pos = np.asarray(pos, dtype=np.float64)
+        covmat = np.asarray(covmat, dtype=np.float64)
+        if covmat.shape != (len(self.vars), len(self.vars)) or pos.shape != (len(self.vars),):
+            raise ValueError("variable mismatch")
+        try:
+            factor = np.linalg.cholesky(covmat)
+        except np.linalg.LinAlgError:
+            # positive semidefinite covariance
+            w, v = np.linalg.eigh(covmat)
+            factor = v * np.sqrt(np.clip(w, 0, None))
+        counts = [min(chunk_size, samples - start) for start in range(0, samples, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(counts))
+        acc = CovarianceAccumulator(self.dim)
+        if executor is None:
+            results = (_monte_carlo_chunk(self, pos, factor, n, s) for n, s in zip(counts, seeds))
+        else:
+            results = executor.map(_monte_carlo_chunk, *zip(*((self, pos, factor, n, s) for n, s in zip(counts, seeds))))
+        for n, mean, m2 in results:
+            part = CovarianceAccumulator(self.dim)
+            part.n, part.mean, part.m2 = n, mean, m2
+            acc.merge(part)
+        return acc.mean, acc.covariance()
+
     def vars(self):
         return self.vars
 
@@ -126,6 +168,60 @@ class Function():
         s += "  " + self.func[self.dim-1].__str__() + " ]"
         return s
 
+# operations acting elementwise on broadcast inputs, they are evaluated on all samples at once
+_ELEMENTWISE = (_ops.Add, _ops.Sub, _ops.Multiply, _ops.Divide, _ops.Pow, _ops.Ln, _ops.Exp, _ops.Sin, _ops.Cos, _ops.Tan,
+                _ops.Sigmoid, _ops.Relu, _ops.Maximum, _ops.Where, _ops.Clip, _ops.Abs)
+
+def _eval_samples(expr, samples:dict, n:int):
+    # evaluates expr for a whole vector of values per variable without touching the graph,
+    # sampled values carry a leading sample axis which broadcasts through elementwise operations,
+    # all other operations (reductions, matmul, reshape, ...) are evaluated sample by sample
+    values = {}
+    batched = set()
+    for node in topological_order(expr):
+        if node.operation is not None:
+            is_batched = [type(item) == Array and id(item) in batched for item in node.input]
+            if not any(is_batched):
+                input = tuple(values[id(item)] if type(item) == Array else item for item in node.input)
+                values[id(node)], _ = node.operation._eval(input)
+                continue
+            batched.add(id(node))
+            if node.operation is _ops.Expand:
+                shape = node.input[1]
+                values[id(node)] = np.broadcast_to(values[id(node.input[0])].reshape((n,) + (1,)*len(shape)), (n,) + shape)
+            elif node.operation in _ELEMENTWISE:
+                # aligns the sample axis of every batched input in front of the output dimensions
+                ndim = len(node.shape)
+                input = []
+                for item, b in zip(node.input, is_batched):
+                    if b:
+                        input.append(values[id(item)].reshape((n,) + (1,)*(ndim - len(item.shape)) + item.shape))
+                    else:
+                        input.append(values[id(item)] if type(item) == Array else item)
+                values[id(node)], _ = node.operation._eval(tuple(input))
+            else:
+                out = np.empty((n,) + node.shape, dtype=np.float64)
+                for k in range(0, n):
+                    input = tuple((values[id(item)][k] if b else values[id(item)]) if type(item) == Array else item
+                                  for item, b in zip(node.input, is_batched))
+                    out[k] = node.operation._eval(input)[0]
+                values[id(node)] = out
+        elif node.name is not None and node.name in samples:
+            values[id(node)] = samples[node.name].reshape((n,) + node.shape)
+            batched.add(id(node))
+        else:
+            values[id(node)] = node.value
+    return np.broadcast_to(values[id(expr)], (n,) + expr.shape).reshape(n)
+
+def _monte_carlo_chunk(func:Function, pos, factor, n:int, seed):
+    rng = np.random.default_rng(seed)
+    x = pos + np.matmul(rng.standard_normal((n, len(func.vars))), np.transpose(factor))
+    samples = {var: x[:,j] for j, var in enumerate(func.vars)}
+    res = np.empty((n, func.dim))
+    for i in range(0, func.dim):
+        res[:,i] = _eval_samples(func.func[i], samples, n)
+    return _chunk_stats(res)
+
 def cross_covariance(valuematrix):
     """
     calculates cross covariance matrix from value matrix
@@ -155,9 +251,115 @@ def correlation_matrix(covarmat):
     returns:
         correlation as numpy array
     """
-    size = covarmat.shape
-    cor = np.zeros(size)
-    for i in range(0, size[0]):
-        for j in range(0, size[0]):
-            cor[i,j] = covarmat[i,j] / (math.sqrt(covarmat[i,i])* math.sqrt(covarmat[j,j]))
-    return cor
\ No newline at end of file
+    std = np.sqrt(np.diag(covarmat))
+    return covarmat / np.outer(std, std)
+
+class CovarianceAccumulator():
+    def __init__(self, dim:int):
+        """
+        online mean and covariance of row vectors, consuming the data chunk by chunk
+
+        -> chunk statistics are merged pairwise (Chan et al.), accumulators of different workers can be merged as well
+
+        param:
+            dim: number of variables (columns)
+        """
+        self.dim = dim
+        self.n = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros((dim, dim))
+
+    def update(self, chunk):
+        """
+        adds a chunk of rows
+
+        param:
+            chunk: 2d array, rows correspond to datasets, columns to variables
+        """
+        other = CovarianceAccumulator(self.dim)
+        other.n, other.mean, other.m2 = _chunk_stats(chunk)
+        self.merge(other)
+        return self
+
+    def merge(self, other:"CovarianceAccumulator"):
+        """
+        merges the statistics of another accumulator into this one
+        """
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 = self.m2 + other.m2 + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean = self.mean + delta * (other.n / n)
+        self.n = n
+        return self
+
+    def covariance(self, ddof:int = 0):
+        """
+        returns:
+            covariance matrix as numpy array (normalized by n-ddof, ddof=0 matches cross_covariance)
+        """
+        if self.n - ddof <= 0:
+            raise ValueError("not enough datasets")
+        return self.m2 / (self.n - ddof)
+
+def _chunk_stats(chunk):
+    chunk = np.asarray(chunk, dtype=np.float64)
+    if chunk.ndim != 2:
+        raise ValueError("wrong value_matrix format")
+    n = chunk.shape[0]
+    if n == 0:
+        return 0, np.zeros(chunk.shape[1]), np.zeros((chunk.shape[1], chunk.shape[1]))
+    mean = np.sum(chunk, axis=0) / n
+    v = chunk - mean
+    return n, mean, np.matmul(np.transpose(v), v)
+
+def _iter_chunks(data, chunk_size:int):
+    if hasattr(data, "shape"):
+        for start in range(0, data.shape[0], chunk_size):
+            yield data[start:start+chunk_size]
+    else:
+        yield from data
+
+def streaming_covariance(data, chunk_size:int = 65536, executor = None, ddof:int = 0, max_pending:int = 8):
+    """
+    calculates mean and covariance matrix without loading all data into memory
+
+    param:
+        data: 2d array or np.memmap (read in chunks of chunk_size rows) or an iterable of 2d row chunks
+        chunk_size: rows per chunk if data is an array
+        executor: optional concurrent.futures executor computing chunk statistics in parallel
+                  (a ThreadPoolExecutor works well since numpy releases the GIL)
+        ddof: delta degrees of freedom of the covariance normalization
+        max_pending: chunks submitted to the executor but not merged yet (bounds the memory used),
+                     about twice the number of workers
+
+    returns:
+        mean vector and covariance matrix as numpy arrays
+    """
+    acc = None
+    def merge(stats):
+        nonlocal acc
+        n, mean, m2 = stats
+        if acc is None:
+            acc = CovarianceAccumulator(mean.shape[0])
+        part = CovarianceAccumulator(mean.shape[0])
+        part.n, part.mean, part.m2 = n, mean, m2
+        acc.merge(part)
+    if executor is None:
+        for chunk in _iter_chunks(data, chunk_size):
+            merge(_chunk_stats(chunk))
+    else:
+        # keep a bounded number of chunks in flight
+        pending = []
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+        for chunk in _iter_chunks(data, chunk_size):
+            pending.append(executor.submit(_chunk_stats, chunk))
+            if len(pending) >= max_pending:
+                merge(pending.pop(0).result())
+        for future in pending:
+            merge(future.result())
+    if acc is None:
+        raise ValueError("no data")
+    return acc.mean, acc.covariance(ddof)
\ No newline at end of file
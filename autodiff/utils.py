@@ -1,24 +1,253 @@
 import autodiff.array as array
+import numpy as np
 
 def get_vars(func:array.Array):
     for node in (func.input or []):
+        if type(node) != array.Array:
+            continue
         if node.name != None:
             yield node.name
         else:
             yield from get_vars(node)
 
 def reset_grads(expr:array.Array):
-    expr._gradient = None
-    for node in (expr.input or []):
-        if type(node) == array.Array:
-            reset_grads(node)
+    """
+    zeros the gradients of all nodes, leaf gradient buffers are returned to the buffer pool
+
+    -> arrays obtained from Array.gradient before must not be used afterwards (copy them if needed)
+    """
+    from autodiff.memory import default_pool
+    for node in topological_order(expr):
+        if type(node._gradient) == np.ndarray:
+            default_pool.release(node._gradient)
+        node._gradient = None
 
 def apply_grads(expr:array.Array, lr:float=0.01):
-    if expr.operation == None and expr.track_grads:
-        expr.value = expr.value - (expr.gradient*lr)
-    for node in (expr.input or []):
-        if type(node) == array.Array:
-            apply_grads(node, lr) 
+    for node in topological_order(expr):
+        if node.operation != None or not node.track_grads or node.gradient is None:
+            continue
+        if type(node.gradient) == array.SparseGradient:
+            # only update the rows touched by the gradient
+            grad = node.gradient.coalesce()
+            node.value[grad.indices] -= (grad.values*lr).astype(node.dtype)
+            node.mark_dirty()
+        else:
+            node.value = node.value - (node.gradient*lr)
+
+def topological_order(expr:array.Array) -> list:
+    """
+    lists every Array node of the graph once, inputs before the nodes using them
+
+    Args:
+        expr: top level node
+
+    Returns:
+        list of Arrays ending with expr
+    """
+    order = []
+    visited = set()
+    stack = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        stack.append((node, True))
+        for input in reversed(node.input or ()):
+            if type(input) == array.Array and id(input) not in visited:
+                stack.append((input, False))
+    return order
+
+def reassociate_matmuls(expr:array.Array, deferred_only:bool = False) -> array.Array:
+    """
+    reorders chains of matrix products in a tracked graph to need the fewest multiplications
+
+    -> only intermediate products without other users are regrouped, the top node of every chain is kept \n
+    -> products of nodes recorded in lazy mode are recorded again instead of being evaluated
+
+    Args:
+        expr: top level node
+        deferred_only: only regroup chains whose top node has not been computed yet
+
+    Returns:
+        expr (modified in place)
+    """
+    from autodiff.operations import Matmul, _chain_order
+    nodes = topological_order(expr)
+    users = {}
+    for node in nodes:
+        for input in (node.input or ()):
+            if type(input) == array.Array:
+                users[id(input)] = users.get(id(input), 0) + 1
+
+    def flatten(node:array.Array, operands:list):
+        for input in node.input:
+            if type(input) == array.Array and input.operation == Matmul and users.get(id(input), 0) == 1 \
+                    and (input._value is None or node._value is not None):
+                absorbed.add(id(input))
+                flatten(input, operands)
+            else:
+                operands.append(input)
+
+    def record(left:array.Array, right:array.Array, top:array.Array) -> array.Array:
+        if top._value is None:
+            arr = Matmul._defer((left, right))
+            arr._record = top._record
+            return arr
+        value, params = Matmul._eval((left.value, right.value))
+        arr = array._wrap(value, track_grads=left.track_grads or right.track_grads)
+        arr.operation = Matmul
+        arr.input = (left, right)
+        arr.params = params
+        arr._input_versions = (left._version, right._version)
+        return arr
+
+    absorbed = set()
+    for node in reversed(nodes):
+        if node.operation != Matmul or id(node) in absorbed or (deferred_only and node._value is not None):
+            continue
+        operands = []
+        flatten(node, operands)
+        if len(operands) < 3 or any(type(o) != array.Array or len(o.shape) != 2 for o in operands):
+            continue
+        split = _chain_order([o.shape for o in operands])
+        def build(i, j):
+            if i == j:
+                return operands[i]
+            k = split[i][j]
+            return record(build(i, k), build(k+1, j), node)
+        k = split[0][len(operands)-1]
+        node.input = (build(0, k), build(k+1, len(operands)-1))
+        node.params = None
+        if node._value is not None:
+            node._input_versions = (node.input[0]._version, node.input[1]._version)
+        node._backward_cache = None
+    return expr
+
+def materialize(*exprs:array.Array):
+    """
+    computes all nodes recorded in lazy mode (see operations.lazy) needed for the given nodes
+
+    -> only nodes the requested ones depend on are computed \n
+    -> identical operations on the same inputs are computed once \n
+    -> chains of matrix products are regrouped (see reassociate_matmuls) \n
+    -> intermediates that are not part of a tracked graph are freed after their last use,
+       elementwise operations write into such a dying input buffer instead of allocating a new one \n
+    -> a freed node is recomputed if it is accessed again, this raises if its inputs changed in the
+       meantime (request such nodes together with the others to keep their value)
+
+    Args:
+        exprs: requested nodes
+    """
+    from autodiff.operations import _INPLACE, _output
+    requested = set(id(e) for e in exprs)
+
+    def deferred_nodes():
+        seen = set()
+        order = []
+        for expr in exprs:
+            for node in topological_order(expr):
+                if id(node) not in seen and node._value is None:
+                    seen.add(id(node))
+                    order.append(node)
+        return order
+
+    # common subexpression elimination
+    canonical = {}
+    replace = {}
+    for node in deferred_nodes():
+        node.input = tuple(replace.get(id(i), i) if type(i) == array.Array else i for i in node.input)
+        key = (node.operation, node._record, tuple(("node", id(i)) if type(i) == array.Array else i for i in node.input))
+        try:
+            hash(key)
+        except TypeError:
+            continue
+        if key in canonical and id(node) not in requested:
+            replace[id(node)] = canonical[key]
+        else:
+            canonical.setdefault(key, node)
+    for node in deferred_nodes():
+        node.input = tuple(replace.get(id(i), i) if type(i) == array.Array else i for i in node.input)
+
+    for expr in exprs:
+        reassociate_matmuls(expr, deferred_only=True)
+
+    nodes = deferred_nodes()
+    pending = set(id(node) for node in nodes)
+    remaining = {}
+    tracked_user = set()
+    for node in nodes:
+        for i in node.input:
+            if type(i) == array.Array and id(i) in pending:
+                remaining[id(i)] = remaining.get(id(i), 0) + 1
+                if node._record:
+                    tracked_user.add(id(i))
+
+    def releasable(node:array.Array) -> bool:
+        return id(node) in pending and id(node) not in requested and not node._record and id(node) not in tracked_user
+
+    for node in nodes:
+        if node._input_versions is not None and node._input_versions != tuple(item._version if type(item) == array.Array else None for item in node.input):
+            # the node was freed after an earlier evaluation, recomputing it would give a different value
+            raise ValueError("freed intermediate accessed after its inputs changed, pass it to materialize together with the result")
+        input = tuple(item.value if type(item) == array.Array else item for item in node.input)
+        buffer = None
+        if node.operation in _INPLACE and not node._record:
+            for i in node.input:
+                # only buffers freshly allocated by an elementwise operation are overwritten
+                if type(i) == array.Array and releasable(i) and remaining[id(i)] == 1 and i.operation in _INPLACE \
+                        and i._value.flags.owndata and i._value.shape == node.shape and i._value.dtype == node.dtype:
+                    buffer = i._value
+                    break
+        if buffer is not None:
+            value, params = _INPLACE[node.operation](*input, out=buffer), None
+        else:
+            value, params = node.operation._eval(input)
+            if node._input_versions is None:
+                # first evaluation of a deferred node, freed nodes which are recomputed do not update state again
+                node.operation._update(input, params)
+        node._value = _output(value, input)
+        node.params = params
+        node._input_versions = tuple(item._version if type(item) == array.Array else None for item in node.input)
+        for i in node.input:
+            if type(i) == array.Array and id(i) in pending:
+                remaining[id(i)] -= 1
+                if remaining[id(i)] == 0 and releasable(i):
+                    i._value = None
+
+    # nodes outside of tracked graphs become plain values as in eager mode
+    for node in nodes:
+        if not node._record and node._value is not None:
+            node.operation = None
+            node.input = None
+            node.params = None
+
+def predict(fn, data:np.ndarray, batch_size:int = 1000, out:np.ndarray = None) -> np.ndarray:
+    """
+    runs a model over data in chunks without building a computation graph
+
+    Args:
+        fn: model function taking an Array of shape (batch, ...) and returning an Array of shape (batch, ...)
+        data: input samples stacked along the first axis
+        batch_size: number of samples passed to fn at once
+        out: optional preallocated output buffer, reused across calls
+
+    Returns:
+        stacked predictions for all samples
+    """
+    from autodiff.operations import inference
+    n = data.shape[0]
+    with inference():
+        for start in range(0, n, batch_size):
+            chunk = array._wrap(np.asarray(data[start:start+batch_size]))
+            res = fn(chunk).value
+            if out is None:
+                out = np.empty((n, *res.shape[1:]), dtype=res.dtype)
+            out[start:start+res.shape[0]] = res
+    return out
 
 # def simplify(func:Expr) -> Expr:
 #     inputs = []
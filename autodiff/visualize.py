@@ -0,0 +1,122 @@
+import json
+import time
+import numpy as np
+from autodiff.array import Array, _needs_grad
+from autodiff.utils import topological_order
+
+
+def profile(expr:Array, repeat:int = 1) -> dict:
+    """
+    measures forward and backward time of every operation node in the graph
+
+    -> every node is re-evaluated on its current input values, the graph itself is not modified \n
+    -> numpy inputs which are not graph nodes (e.g. running statistics of batch_norm) are passed as copies,
+       nodes calling user functions given as input (e.g. the step function of scan) are not timed \n
+    -> backward uses the stored node gradient or ones if no backward pass was run yet
+
+    Args:
+        expr: top level node
+        repeat: number of runs per node, the fastest run is reported
+
+    Returns:
+        dictionary mapping id(node) to (forward seconds, backward seconds), None for nodes not timed
+    """
+    times = {}
+    for node in topological_order(expr):
+        if node.operation is None:
+            continue
+        if any(callable(item) for item in node.input):
+            times[id(node)] = (None, None)
+            continue
+        # state updated in place by an operation stays untouched
+        input = tuple(item.value if type(item) == Array else np.array(item) if type(item) == np.ndarray else item
+                      for item in node.input)
+        fwd = float("inf")
+        for _ in range(0, repeat):
+            start = time.perf_counter()
+            _, params = node.operation._eval(input)
+            fwd = min(fwd, time.perf_counter() - start)
+        gradient = node.gradient
+        if gradient is None or type(gradient) != np.ndarray:
+            gradient = np.ones(node.shape, dtype=node.dtype)
+        bwd = None
+        needs_grad = _needs_grad(node)
+        if any(needs_grad):
+            bwd = float("inf")
+            for _ in range(0, repeat):
+                start = time.perf_counter()
+                node.operation._backward(gradient, input, params, needs_grad)
+                bwd = min(bwd, time.perf_counter() - start)
+        times[id(node)] = (fwd, bwd)
+    return times
+
+def _describe(expr:Array, timed:bool) -> tuple:
+    nodes = topological_order(expr)
+    index = {id(node): i for i, node in enumerate(nodes)}
+    times = profile(expr) if timed else {}
+    entries = []
+    for node in nodes:
+        fwd, bwd = times.get(id(node), (None, None))
+        entries.append({
+            "id": index[id(node)],
+            "op": node.operation.__name__ if node.operation is not None else None,
+            "name": node.name,
+            "shape": list(node.shape),
+            "dtype": str(node.dtype),
+            "bytes": int(node.value.nbytes),
+            "track_grads": node.track_grads,
+            "inputs": [index[id(i)] for i in (node.input or ()) if type(i) == Array],
+            "forward_time": fwd,
+            "backward_time": bwd,
+        })
+    return entries
+
+def to_json(expr:Array, timed:bool = True) -> str:
+    """
+    exports the graph as json, every node is listed once
+
+    Args:
+        expr: top level node
+        timed: measure forward and backward time of every node (see profile)
+
+    Returns:
+        json string with a list of nodes (op, name, shape, dtype, bytes, inputs, times)
+    """
+    return json.dumps({"nodes": _describe(expr, timed)}, indent=2)
+
+def to_dot(expr:Array, timed:bool = True) -> str:
+    """
+    exports the graph in graphviz dot format, every node is drawn once
+
+    Args:
+        expr: top level node
+        timed: measure forward and backward time of every node (see profile)
+
+    Returns:
+        dot source, render e.g. with "dot -Tsvg graph.dot -o graph.svg"
+    """
+    lines = ["digraph autodiff {", "    node [shape=box, fontname=monospace];"]
+    for entry in _describe(expr, timed):
+        title = entry["op"] or entry["name"] or ("param" if entry["track_grads"] else "const")
+        if entry["op"] is not None and entry["name"] is not None:
+            title += f" ({entry['name']})"
+        label = [title, f"{tuple(entry['shape'])} {entry['dtype']}", _format_bytes(entry["bytes"])]
+        if entry["forward_time"] is not None:
+            label.append(f"fwd {entry['forward_time']*1e3:.3f} ms")
+        if entry["backward_time"] is not None:
+            label.append(f"bwd {entry['backward_time']*1e3:.3f} ms")
+        style = "" if entry["op"] is not None else ", style=rounded"
+        if entry["track_grads"] and entry["op"] is None:
+            style += ", color=blue"
+        lines.append(f"    n{entry['id']} [label=\"" + "\\n".join(label).replace('"', "'") + f"\"{style}];")
+        for i in entry["inputs"]:
+            lines.append(f"    n{i} -> n{entry['id']};")
+    lines.append("}")
+    return "\n".join(lines)
+
+def _format_bytes(n:int) -> str:
+    for unit in ["B", "KB", "MB"]:
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
@@ -1,7 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from autodiff.utils import reset_grads, apply_grads
+from autodiff.utils import predict
 import autodiff as ad
+from autodiff.data import load_idx, one_hot, DataLoader
+from autodiff.parallel import DataParallel
+from autodiff import checkpoint
 import torch
 
 #*********************************************
@@ -9,46 +12,21 @@ import torch
 #*********************************************
 
 def load_mnist(folder: str):
-    with open(folder+"/t10k-images.idx3-ubyte", "rb") as f:
-        f.read(16)
-        image_size = 28
-        num_images = 10000
-        buf = f.read(image_size * image_size * num_images)
-        data = np.frombuffer(buf, dtype=np.uint8).astype(np.float32)
-        test_img = data.reshape(num_images, 1, image_size, image_size)
-    with open(folder+"/train-images.idx3-ubyte", "rb") as f:
-        f.read(16)
-        image_size = 28
-        num_images = 60000
-        buf = f.read(image_size * image_size * num_images)
-        data = np.frombuffer(buf, dtype=np.uint8).astype(np.float32)
-        train_img = data.reshape(num_images, 1, image_size, image_size)
-    with open(folder+"/t10k-labels.idx1-ubyte", "rb") as f:
-        f.read(8)
-        num_images = 10000
-        buf = f.read(num_images)
-        data = np.frombuffer(buf, dtype=np.uint8)
-        test_lbl = data.reshape(num_images,1)
-    with open(folder+"/train-labels.idx1-ubyte", "rb") as f:
-        f.read(8)
-        num_images = 60000
-        buf = f.read(num_images)
-        data = np.frombuffer(buf, dtype=np.uint8)
-        train_lbl = data.reshape(num_images,1)
+    test_img = load_idx(folder+"/t10k-images.idx3-ubyte")
+    train_img = load_idx(folder+"/train-images.idx3-ubyte")
+    test_lbl = load_idx(folder+"/t10k-labels.idx1-ubyte")
+    train_lbl = load_idx(folder+"/train-labels.idx1-ubyte")
     return train_img, train_lbl, test_img, test_lbl
 
-# load mnist data
+# load mnist data (memory-mapped)
 train_img0, train_lbl0, test_img0, test_lbl0 = load_mnist("./data")
 
-# normalize images and labels
-train_img = train_img0 / 255
-test_img = test_img0 / 255
-train_lbl = np.zeros((train_lbl0.shape[0], 10))
-for i in range(0, train_lbl0.shape[0]):
-    train_lbl[i, int(train_lbl0[i])] = 1
-test_lbl = np.zeros((test_lbl0.shape[0], 10))
-for i in range(0, test_lbl0.shape[0]):
-    test_lbl[i, int(test_lbl0[i])] = 1
+# images and labels are normalized batch by batch, the datasets stay memory-mapped
+def normalize_batch(img, lbl):
+    return img[:,None,:,:].astype(np.float32) / 255, one_hot(lbl, 10)
+
+train_loader = DataLoader(train_img0, train_lbl0, batch_size=30, shuffle=True, transform=normalize_batch)
+test_loader = DataLoader(test_img0, test_lbl0, batch_size=1000, shuffle=False, transform=normalize_batch)
 
 #*********************************************
 # train model (autodiff)
@@ -68,35 +46,36 @@ weight2 = ad.from_numpy(weight2, track_grads=True)
 bias2 = ad.from_numpy(bias2, track_grads=True)
 weight3 = ad.from_numpy(weight3, track_grads=True)
 
-def forward(img: ad.Array) -> ad.Array:
+def logits(img: ad.Array) -> ad.Array:
     i1 = ad.reshape(img, (784,1))
     i2 = weight1@i1 + bias1
     i3 = ad.sigmoid(i2)
     i4 = weight2@i3 + bias2
     i5 = ad.sigmoid(i4)
     i6 = weight3@i5
-    i7 = ad.softmax(i6)
-    return i7
+    return i6
+
+def forward(img: ad.Array) -> ad.Array:
+    return ad.softmax(logits(img))
+
+def forward_batch(img: ad.Array) -> ad.Array:
+    # batched forward pass (samples as columns), softmax is skipped since it does not change the argmax
+    n = img.shape[0]
+    ones = ad.Array(np.ones((1, n)))
+    i1 = ad.transpose(ad.reshape(img, (n,784)))
+    i2 = weight1@i1 + bias1@ones
+    i3 = ad.sigmoid(i2)
+    i4 = weight2@i3 + bias2@ones
+    i5 = ad.sigmoid(i4)
+    i6 = weight3@i5
+    return ad.transpose(i6)
 
 def run_test_set() -> tuple[int, int]:
     right = 0
-    wrong = 0
-    for i in range(0, 10000):
-        img = ad.Array(test_img[i], dtype=np.float32)
-        lbl = test_lbl[i]
-
-        out = forward(img)
-
-        out = np.reshape(out.value, (10,))
-
-        index_lbl = np.argmax(lbl)
-        index_out = np.argmax(out)
-
-        if index_out == index_lbl:
-            right += 1
-        else:
-            wrong += 1
-
+    for batch_img, batch_lbl in test_loader:
+        out = predict(forward_batch, batch_img, batch_size=1000)
+        right += int(np.sum(np.argmax(out, axis=1) == np.argmax(batch_lbl, axis=1)))
+    wrong = test_img0.shape[0] - right
     return right, wrong
 
 # run training
@@ -104,31 +83,35 @@ epochs = 10
 pred_results = np.zeros(epochs+1)
 right, wrong = run_test_set()
 pred_results[0] = (right / (wrong+right)) * 100
-for epoch in range(0,epochs):
-    in_size = 60000
-    batchsize = 30
-    permutation = np.random.permutation(in_size)
-    loss_acc = 0
-    for i in range(0, 60000):
-        perm = permutation[i]
-        img = ad.Array(train_img[perm], dtype=np.float32)
-        lbl = ad.reshape(ad.Array(train_lbl[perm], dtype=np.float32), (10, 1))
+def sample_losses(batch_img, batch_lbl):
+    for j in range(0, batch_img.shape[0]):
+        img = ad.from_numpy(batch_img[j])
+        lbl = ad.from_numpy(batch_lbl[j].reshape(10, 1))
 
         with ad.track_computation():
-            output = forward(img)
-            loss = ad.mean_squared_error(output, lbl)
-
-        if i%100==0:
-            print(f"epoch: {epoch}, iteration: {i}, loss: {loss}")
+            output = logits(img)
+            loss = ad.softmax_cross_entropy(output, lbl, axis=0)
+        yield loss
 
-        loss.backward()
+# every batch is sharded over all cores, the gradient of the mean loss is applied once
+# (lr 0.3 on the mean of 30 samples is the former step of 0.01 on their sum)
+trainer = DataParallel(sample_losses, [weight1, bias1, weight2, bias2, weight3], lr=0.3)
+for epoch in range(0,epochs):
+    for b, (batch_img, batch_lbl) in enumerate(train_loader):
+        loss = trainer.step(batch_img, batch_lbl)
 
-        if i%30==0:
-            apply_grads(loss, lr=0.01)
-            reset_grads(loss)
+        if b%4==0:
+            print(f"epoch: {epoch}, iteration: {b*30}, loss: {loss}")
 
     right, wrong = run_test_set()
     pred_results[epoch+1] = (right / (wrong+right)) * 100
+trainer.close()
+
+# store the trained model graph, it can be reloaded with checkpoint.load and evaluated with model.eval(img=...)
+example_img, example_lbl = normalize_batch(test_img0[:9], test_lbl0[:9])
+with ad.track_computation():
+    model = forward(ad.Array(example_img[0], name="img"))
+checkpoint.save("./data/mnist_mlp.adg", model)
 
 # plot results
 fig1 = plt.figure()
@@ -145,7 +128,7 @@ ax.legend()
 # plot tests
 fig2 = plt.figure()
 for i in range(0, 9):
-    img = ad.Array(test_img[i], dtype=np.float32)
+    img = ad.Array(example_img[i], dtype=np.float32)
 
     out = forward(img)
     out = np.reshape(out.value, (10,))
@@ -197,21 +180,22 @@ def error(output, target):
 def run_test_set() -> tuple[int, int]:
     right = 0
     wrong = 0
-    for i in range(0, 10000):
-        img = torch.tensor(test_img[i], dtype=torch.float32)
-        lbl = torch.tensor(test_lbl[i])
+    for batch_img, batch_lbl in test_loader:
+        for j in range(0, batch_img.shape[0]):
+            img = torch.tensor(batch_img[j], dtype=torch.float32)
+            lbl = torch.tensor(batch_lbl[j])
 
-        out = forward(img)
+            out = forward(img)
 
-        out = torch.reshape(out, (10,))
+            out = torch.reshape(out, (10,))
 
-        index_lbl = torch.argmax(lbl)
-        index_out = torch.argmax(out)
+            index_lbl = torch.argmax(lbl)
+            index_out = torch.argmax(out)
 
-        if index_out == index_lbl:
-            right += 1
-        else:
-            wrong += 1
+            if index_out == index_lbl:
+                right += 1
+            else:
+                wrong += 1
 
     return right, wrong
 
@@ -222,25 +206,24 @@ right, wrong = run_test_set()
 pred_results[0] = (right / (wrong+right)) * 100
 optim = torch.optim.SGD(tensors, 0.01)
 for epoch in range(0,epochs):
-    in_size = 60000
-    batchsize = 30
-    permutation = np.random.permutation(in_size)
-    for i in range(0, 60000):
-        perm = permutation[i]
-        img = torch.tensor(train_img[perm], dtype=torch.float32)
-        lbl = torch.tensor(train_lbl[perm], dtype=torch.float32)
+    i = 0
+    for batch_img, batch_lbl in train_loader:
+        for j in range(0, batch_img.shape[0]):
+            img = torch.tensor(batch_img[j], dtype=torch.float32)
+            lbl = torch.tensor(batch_lbl[j], dtype=torch.float32)
 
-        output = forward(img)
-        loss = error(output, lbl)
+            output = forward(img)
+            loss = error(output, lbl)
 
-        if i%100==0:
-            print(f"epoch: {epoch}, iteration: {i}, loss: {loss}")
+            if i%100==0:
+                print(f"epoch: {epoch}, iteration: {i}, loss: {loss}")
 
-        loss.backward()
+            loss.backward()
+            i += 1
 
-        if i%30==0:
-            optim.step()
-            optim.zero_grad()
+        # one update per batch of 30 samples
+        optim.step()
+        optim.zero_grad()
 
     right, wrong = run_test_set()
     print(right, wrong)
@@ -261,7 +244,7 @@ ax.legend()
 # plot tests
 fig2 = plt.figure()
 for i in range(0, 9):
-    img = torch.tensor(test_img[i], dtype=torch.float32)
+    img = torch.tensor(example_img[i], dtype=torch.float32)
 
     out = forward(img)
     out = torch.reshape(out, (10,))
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+import time
+
+#*********************************************
+# measure interpreter startup with autodiff imports
+#*********************************************
+
+def measure(code: str, runs: int = 20) -> float:
+    best = float("inf")
+    for _ in range(0, runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+cases = {
+    "python": "pass",
+    "import numpy": "import numpy",
+    "import autodiff": "import autodiff",
+    "import autodiff.data": "import autodiff.data",
+    "autodiff.Array arithmetic": "import autodiff as ad; ad.Array([1.0]) * 2",
+}
+
+for name, code in cases.items():
+    print(f"{name:30s} {measure(code)*1000:8.1f} ms")
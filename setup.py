@@ -6,5 +6,5 @@ setup(
    description='simple automatic differentiation for statistical analysis',
    author='ttpr0',
    packages=['autodiff'], 
-   install_requires=['numpy'], 
+   install_requires=['numpy', 'scipy'], 
 )
\ No newline at end of file
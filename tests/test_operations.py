@@ -0,0 +1,18 @@
+import numpy as np
+import autodiff as ad
+from autodiff.array import Array
+from autodiff.operations import _moments
+
+
+def test_moments_large_mean_small_variance():
+    rng = np.random.default_rng(0)
+    x = (1e4 + 1e-2 * rng.standard_normal((4096, 4))).astype(np.float32)
+    mean, var = _moments(x, (0,))
+    expected = np.var(x.astype(np.float64), axis=0)
+    assert np.allclose(var.ravel(), expected, rtol=1e-3)
+
+def test_batch_norm_large_mean_small_variance():
+    rng = np.random.default_rng(0)
+    x = (1e4 + 1e-2 * rng.standard_normal((4096, 4))).astype(np.float32)
+    out = ad.batch_norm(Array(x), eps=0)
+    assert np.allclose(np.std(out.value, axis=0), 1, atol=1e-2)
@@ -0,0 +1,31 @@
+import numpy as np
+import autodiff as ad
+from autodiff.parallel import DataParallel
+
+
+def _step(workers:int, per_sample:bool) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((10, 3))
+    y = rng.standard_normal((10, 1))
+    w = ad.from_numpy(np.ones((1, 3)), track_grads=True)
+
+    def loss_fn(xs, ys):
+        if per_sample:
+            for j in range(0, xs.shape[0]):
+                with ad.track_computation():
+                    yield ad.mean_squared_error(w @ ad.from_numpy(xs[j].reshape(3, 1)), ad.from_numpy(ys[j].reshape(1, 1)))
+        else:
+            with ad.track_computation():
+                pred = ad.transpose(w @ ad.transpose(ad.from_numpy(xs)))
+                yield ad.mean_squared_error(pred, ad.from_numpy(ys))
+
+    with DataParallel(loss_fn, [w], workers=workers, lr=0.1) as trainer:
+        trainer.step(x, y)
+    return w.value
+
+def test_update_does_not_depend_on_workers():
+    for per_sample in (False, True):
+        single = _step(1, per_sample)
+        for workers in (2, 4):
+            assert np.allclose(_step(workers, per_sample), single)
+    assert np.allclose(_step(1, False), _step(1, True))
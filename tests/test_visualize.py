@@ -0,0 +1,26 @@
+import numpy as np
+import autodiff as ad
+from autodiff.array import Array
+from autodiff.visualize import profile
+
+
+def test_profile_keeps_model_state():
+    rng = np.random.default_rng(0)
+    x = Array(rng.standard_normal((8, 3)) + 50, track_grads=True)
+    running_mean = np.zeros(3)
+    running_var = np.ones(3)
+    calls = []
+
+    def step(carry, item):
+        calls.append(1)
+        return carry + item
+
+    with ad.track_computation():
+        h = ad.batch_norm(x, running_mean=running_mean, running_var=running_var)
+        y = ad.sum(ad.scan(step, Array(np.zeros(3)), h))
+    mean, var, n = running_mean.copy(), running_var.copy(), len(calls)
+    times = profile(y)
+    assert np.array_equal(running_mean, mean)
+    assert np.array_equal(running_var, var)
+    assert len(calls) == n
+    assert all(t[0] is not None for node_id, t in times.items() if node_id != id(y.input[0]))